@@ -1,12 +1,163 @@
-from .calculate import *
-from .policy import *
-from .behavior import *
-from .growth import *
-from .records import *
-from .simpletaxio import *
-from .utils import *
-from .decorators import *
-
-from ._version import get_versions
-__version__ = get_versions()['version']
-del get_versions
+"""
+Tax-Calculator package.
+
+The submodules are imported the first time one of their names is looked
+up in the package, so that, for example, importing just Policy does not
+import pandas and numba or make the calc functions.
+"""
+import os
+import sys
+import ast
+import importlib
+import six
+
+# submodules whose public names the package exports; when two of them
+# export the same name, the later one's value is the package's
+_SUBMODULES = ('calculate', 'policy', 'behavior', 'growth', 'records',
+               'simpletaxio', 'utils', 'decorators', 'calcgraph')
+
+# submodule of each of the main names, which are looked up without
+# importing the other submodules
+_SUBMODULE_OF = {
+    'Policy': 'policy',
+    'ParametersBase': 'parameters_base',
+    'Behavior': 'behavior',
+    'Growth': 'growth',
+    'Records': 'records',
+    'Calculator': 'calculate',
+    'calc_all_chunks': 'calculate',
+    'SimpleTaxIO': 'simpletaxio',
+    'CalcGraph': 'calcgraph',
+    'iterate_jit': 'decorators',
+    'fused_jit': 'decorators',
+}
+
+# names found in the source of each submodule by _exported_names
+_EXPORTED_NAMES = {}
+
+
+def _exported_names(submodule):
+    """
+    Return the frozenset of the names that `from <submodule> import *`
+    binds, found from the source of the submodule without importing it.
+    """
+    if submodule not in _EXPORTED_NAMES:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            submodule + '.py')
+        with open(path) as source_file:
+            tree = ast.parse(source_file.read())
+        names = set()
+        statements = list(tree.body)
+        while statements:
+            node = statements.pop()
+            if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+                names.add(node.name)
+            elif isinstance(node, ast.Assign):
+                for target in node.targets:
+                    names.update(name_node.id
+                                 for name_node in ast.walk(target)
+                                 if isinstance(name_node, ast.Name))
+            elif isinstance(node, ast.Import):
+                names.update(alias.asname or alias.name.split('.')[0]
+                             for alias in node.names)
+            elif isinstance(node, ast.ImportFrom):
+                for alias in node.names:
+                    if alias.name != '*':
+                        names.add(alias.asname or alias.name)
+                    elif node.level == 1:
+                        names.update(_exported_names(node.module))
+            elif isinstance(node, ast.If):
+                statements.extend(node.body + node.orelse)
+            elif hasattr(ast, 'Try') and isinstance(node, ast.Try):
+                statements.extend(node.body + node.orelse + node.finalbody)
+                for handler in node.handlers:
+                    statements.extend(handler.body)
+        _EXPORTED_NAMES[submodule] = frozenset(
+            name for name in names if not name.startswith('_'))
+    return _EXPORTED_NAMES[submodule]
+
+
+def _public_names():
+    """
+    Import all of _SUBMODULES and return the dictionary of the names they
+    export, as `from <submodule> import *` would, and of their values.
+    """
+    names = {}
+    for submodule in _SUBMODULES:
+        module = _import(submodule)
+        for name in vars(module):
+            if not name.startswith('_'):
+                names[name] = getattr(module, name)
+    return names
+
+
+def _import(submodule):
+    """
+    Import and return the given submodule.
+
+    An AttributeError raised while the submodule is imported is raised
+    again as an ImportError, because Python would otherwise report it as
+    the name being looked up not existing.
+
+    Importing a submodule binds its name in the package to the submodule,
+    even when the package exports a function of that name (as it does the
+    behavior function of the behavior submodule), so those names are bound
+    again to the exported functions.
+    """
+    try:
+        module = importlib.import_module('.' + submodule, __name__)
+    except AttributeError as error:
+        msg = 'importing {}.{} raised AttributeError: {}'
+        six.raise_from(ImportError(msg.format(__name__, submodule, error)),
+                       error)
+    for name in _SUBMODULES:
+        other = sys.modules.get(__name__ + '.' + name)
+        if other is not None and globals().get(name) is other:
+            exported = getattr(other, name, None)
+            if exported is not None and not isinstance(exported,
+                                                       type(other)):
+                globals()[name] = exported
+    return module
+
+
+def _get_version():
+    from ._version import get_versions
+    return get_versions()['version']
+
+
+if sys.version_info < (3, 7):
+    # modules cannot look up missing names with __getattr__ before 3.7
+    globals().update(_public_names())
+    __version__ = _get_version()
+else:
+    def __getattr__(name):
+        if name in _SUBMODULE_OF:
+            value = getattr(_import(_SUBMODULE_OF[name]), name)
+        elif name == '__version__':
+            value = _get_version()
+        elif name == '__all__':
+            # `from taxcalc import *` exports every name, as it always has
+            # and the submodules, which importing them binds in the package
+            names = set(filename[:-3] for filename in
+                        os.listdir(os.path.dirname(os.path.abspath(__file__)))
+                        if filename.endswith('.py') and
+                        not filename.startswith('_'))
+            for submodule in _SUBMODULES:
+                names.update(_exported_names(submodule))
+            return sorted(names)
+        else:
+            for submodule in reversed(_SUBMODULES):
+                if name in _exported_names(submodule):
+                    value = getattr(_import(submodule), name)
+                    break
+            else:
+                path = os.path.join(os.path.dirname(__file__), name + '.py')
+                if name.startswith('__') or not os.path.exists(path):
+                    msg = "module '{}' has no attribute '{}'"
+                    raise AttributeError(msg.format(__name__, name))
+                return _import(name)
+        globals()[name] = value
+        return value
+
+    def __dir__():
+        return sorted(set(globals()) | set(__getattr__('__all__')))
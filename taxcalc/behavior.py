@@ -1,4 +1,3 @@
-import copy
 import numpy as np
 from .policy import Policy
 from .parameters_base import ParametersBase
@@ -67,7 +66,7 @@ def behavior(calc_x, calc_y, update_income=update_income):
 
     income_effect = calc_y.behavior.BE_inc * (calc_y.records._iitax -
                                               calc_x.records._iitax)
-    calc_y_behavior = copy.deepcopy(calc_y)
+    calc_y_behavior = calc_y.fork()
 
     combined_behavioral_effect = income_effect + substitution_effect
 
@@ -0,0 +1,244 @@
+"""
+Tax-Calculator dependency graph of the iterate_jit calc functions.
+"""
+from multiprocessing.pool import ThreadPool
+
+
+class CalcGraph(object):
+    """
+    Constructor for the directed acyclic graph of the dependencies among a
+    sequence of iterate_jit calc functions.
+
+    The graph is derived from the arguments each calc function reads and
+    the values it returns.  A calc function depends on an earlier one in
+    the sequence when it reads a variable the earlier one writes, or when
+    it writes a variable the earlier one reads or writes.  Running the calc
+    functions in any order that respects these dependencies therefore gives
+    the same results as running them in sequence.
+
+    Parameters
+    ----------
+    funcs: sequence of iterate_jit calc functions
+        in an order in which running them one after another gives the
+        correct results
+
+    Raises
+    ------
+    ValueError:
+        if any of funcs is not an iterate_jit calc function.
+
+    Returns
+    -------
+    class instance: CalcGraph
+    """
+
+    def __init__(self, funcs):
+        self._funcs = tuple(funcs)
+        self._reads = []
+        self._writes = []
+        self._params = []
+        for func in self._funcs:
+            if not hasattr(func, 'out_args'):
+                msg = '{} is not an iterate_jit calc function'
+                raise ValueError(msg.format(getattr(func, '__name__', func)))
+            skipped = set(func.parameters) | set(func.kwargs_for_func)
+            self._reads.append(set(func.in_args) - skipped)
+            self._writes.append(set(func.out_args))
+            self._params.append(set(func.parameters) & set(func.in_args) -
+                                set(func.kwargs_for_func))
+        # predecessors of each calc function, as indices into _funcs
+        self._preds = []
+        for j in range(len(self._funcs)):
+            used_j = self._reads[j] | self._writes[j]
+            self._preds.append(set(
+                i for i in range(j)
+                if self._writes[i] & used_j or self._reads[i] & self._writes[j]
+            ))
+        # successors of each calc function, as indices into _funcs
+        self._succs = [set() for _ in self._funcs]
+        for j, preds in enumerate(self._preds):
+            for i in preds:
+                self._succs[i].add(j)
+        # calc functions grouped so that each group depends only on
+        # the groups before it
+        depth = []
+        for preds in self._preds:
+            depth.append(max([depth[i] + 1 for i in preds] or [0]))
+        self._levels = [[self._funcs[j] for j in range(len(self._funcs))
+                         if depth[j] == level]
+                        for level in range(max(depth or [-1]) + 1)]
+
+    @property
+    def funcs(self):
+        """
+        The calc functions in the graph, in their original order.
+        """
+        return self._funcs
+
+    @property
+    def levels(self):
+        """
+        List of lists of calc functions such that the functions in each
+        list depend only on functions in earlier lists, so the functions in
+        any one list can be run at the same time.
+        """
+        return [list(level) for level in self._levels]
+
+    @property
+    def inputs(self):
+        """
+        The set of records variables read by any calc function in the graph.
+        """
+        return set().union(*self._reads)
+
+    @property
+    def initial_inputs(self):
+        """
+        The set of records variables that some calc function in the graph
+        reads before any earlier one writes them, which are the variables
+        whose values before the graph is run matter.
+        """
+        found = set()
+        written = set()
+        for reads, writes in zip(self._reads, self._writes):
+            found.update(reads - written)
+            written.update(writes)
+        return found
+
+    @property
+    def outputs(self):
+        """
+        The set of records variables written by any calc function in the
+        graph.
+        """
+        return set().union(*self._writes)
+
+    def reads(self, func):
+        """
+        Return the set of records variables the calc function func reads.
+        """
+        return set(self._reads[self._index(func)])
+
+    def writes(self, func):
+        """
+        Return the set of records variables the calc function func writes.
+        """
+        return set(self._writes[self._index(func)])
+
+    def parameters(self, func):
+        """
+        Return the set of policy parameters the calc function func reads.
+        """
+        return set(self._params[self._index(func)])
+
+    def dependencies(self, func):
+        """
+        Return the list of calc functions that must be run before func,
+        in their original order.
+        """
+        return [self._funcs[i] for i in sorted(self._preds[self._index(func)])]
+
+    def ancestors(self, func):
+        """
+        Return the list of calc functions that func depends on directly or
+        indirectly, in their original order.
+        """
+        found = self._closure(self._preds[self._index(func)])
+        return [self._funcs[i] for i in sorted(found)]
+
+    def subgraph(self, variables):
+        """
+        Return the CalcGraph of just the calc functions that must be run
+        for the given records variables to end up with the values that
+        running the whole graph gives them.
+        """
+        variables = set(variables)
+        found = self._closure(i for i, writes in enumerate(self._writes)
+                              if writes & variables)
+        return CalcGraph([self._funcs[i] for i in sorted(found)])
+
+    def affected_subgraph(self, parameters, funcs=()):
+        """
+        Return the CalcGraph of just the calc functions that must be run
+        again after the given policy parameters change, when the records
+        already hold the results of running the whole graph before the
+        change.  These are the functions that read the parameters, or that
+        are given in funcs, the functions that depend on them, and the
+        functions those depend on, because the records may no longer hold
+        the values the latter first produced.
+        """
+        parameters = set(parameters)
+        start = set(i for i, params in enumerate(self._params)
+                    if params & parameters)
+        start.update(self._index(func) for func in funcs)
+        found = self._closure(self._closure(start, self._succs))
+        return CalcGraph([self._funcs[i] for i in sorted(found)])
+
+    def run(self, pm, pf, workers=1, threads=1):
+        """
+        Run every calc function in the graph on pm (the policy) and pf (the
+        records), writing the results into pf.
+
+        Parameters
+        ----------
+        pm: Policy class instance
+
+        pf: Records class instance
+
+        workers: integer
+            number of calc functions that may run at the same time; with
+            more than one worker the functions in each of the levels run
+            concurrently on a pool of that many threads, which speeds things
+            up only because the compiled calc functions release the GIL
+            default value is 1, which runs the functions in their original
+            order
+
+        threads: integer
+            passed on to each calc function
+            default value is 1
+
+        Returns
+        -------
+        nothing: void
+        """
+        def call(func):
+            func(pm, pf, threads=threads, return_df=False)
+
+        if workers == 1 or len(self._funcs) < 2:
+            for func in self._funcs:
+                call(func)
+            return
+        pool = ThreadPool(workers)
+        try:
+            for level in self._levels:
+                if len(level) == 1:
+                    call(level[0])
+                else:
+                    pool.map(call, level)
+        finally:
+            pool.close()
+            pool.join()
+
+    def _closure(self, indices, links=None):
+        """
+        Return the set of the given indices and of the indices of all the
+        calc functions they depend on directly or indirectly, or, when
+        links is self._succs, of all those that depend on them.
+        """
+        if links is None:
+            links = self._preds
+        found = set(indices)
+        stack = list(found)
+        while stack:
+            for i in links[stack.pop()]:
+                if i not in found:
+                    found.add(i)
+                    stack.append(i)
+        return found
+
+    def _index(self, func):
+        try:
+            return self._funcs.index(func)
+        except ValueError:
+            msg = '{} is not in the graph'.format(func.__name__)
+            raise ValueError(msg)
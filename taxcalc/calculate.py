@@ -3,6 +3,7 @@ Tax-Calculator federal tax Calculator class.
 """
 import math
 import copy
+import multiprocessing
 import numpy as np
 import pandas as pd
 from pandas import DataFrame
@@ -12,6 +13,8 @@ from .policy import Policy
 from .records import Records
 from .behavior import Behavior
 from .growth import Growth, adjustment, target
+from .decorators import KERNEL_CACHE_DIR
+from .calcgraph import CalcGraph
 
 
 all_cols = set()
@@ -28,10 +31,315 @@ def add_df(alldfs, df):
             alldfs[dup_index] = df[col]
 
 
+def precompile(data="puf.csv", num_records=100, **kwargs):
+    """
+    Compile every calc function and its generated apply function for the
+    argument types found in data, filling the on-disk kernel cache so that
+    later processes load the compiled kernels instead of compiling them.
+
+    Parameters
+    ----------
+    data: string or Pandas DataFrame
+        records data as accepted by the Records class constructor; only its
+        first num_records rows are used because the compiled kernels depend
+        only on the column types, not on the number of records
+
+    num_records: integer
+        number of records used to run the calculations
+
+    kwargs: keyword arguments passed on to the Records class constructor
+
+    Raises
+    ------
+    ValueError:
+        if the kernel cache is not enabled.
+
+    Returns
+    -------
+    nothing: void
+    """
+    if not KERNEL_CACHE_DIR:
+        msg = ('kernel cache is not enabled; set the TAXCALC_CACHE_DIR '
+               'environment variable before importing taxcalc')
+        raise ValueError(msg)
+    if isinstance(data, str):
+        if data.endswith("gz"):
+            data = pd.read_csv(data, compression='gzip', nrows=num_records)
+        else:
+            data = pd.read_csv(data, nrows=num_records)
+    else:
+        data = data.head(num_records)
+    calc = Calculator(policy=Policy(), records=Records(data=data, **kwargs))
+    calc.calc_all()
+
+
+def calc_all_chunks(data, chunksize=100000, policy=None, year=None,
+                    outputs=('_iitax', '_fica', '_combined'),
+                    output_file=None, **kwargs):
+    """
+    Calculate the taxes of records data too large to fit in memory at once,
+    one chunk of records at a time, so that memory use is bounded by the
+    chunk size rather than by the number of records.
+
+    Parameters
+    ----------
+    data: string or Pandas DataFrame
+        records data as accepted by the Records.chunks method
+
+    chunksize: integer
+        number of records calculated at a time
+
+    policy: None or Policy class instance
+        None implies current-law policy
+        default value is None
+
+    year: None or integer
+        None implies the current_year of policy; otherwise a later year to
+        which every chunk is moved (see Calculator.advance_to_year)
+        default value is None
+
+    outputs: iterable of records variable names
+        default value is ('_iitax', '_fica', '_combined')
+
+    output_file: None or string
+        name of a CSV file to which the RECID and outputs of every record
+        are written, chunk by chunk
+        default value is None
+
+    kwargs: keyword arguments passed on to the Records class constructor
+
+    Returns
+    -------
+    Pandas Series holding the weighted total of each of outputs over all
+    the records
+
+    Raises
+    ------
+    ValueError:
+        if year is earlier than the current_year of policy.
+    """
+    if policy is None:
+        policy = Policy()
+    if year is not None and year < policy.current_year:
+        msg = 'year {} is earlier than the current_year {} of policy'
+        raise ValueError(msg.format(year, policy.current_year))
+    outputs = list(outputs)
+    totals = pd.Series(0., index=outputs)
+    header = True
+    for records in Records.chunks(data, chunksize, **kwargs):
+        calc = Calculator(policy=copy.deepcopy(policy), records=records)
+        if year is not None and year > calc.current_year:
+            calc.advance_to_year(year)
+        calc.calc_all()
+        for name in outputs:
+            totals[name] += (getattr(calc.records, name) *
+                             calc.records.s006).sum()
+        if output_file is not None:
+            chunk_results = DataFrame(
+                dict((name, getattr(calc.records, name))
+                     for name in ['RECID'] + outputs),
+                columns=['RECID'] + outputs)
+            chunk_results.to_csv(output_file, mode='w' if header else 'a',
+                                 header=header, index=False)
+            header = False
+    return totals
+
+
+# Calc functions run by calc_one_year before choosing between the standard
+# deduction and itemized deductions, in each pass that makes that choice,
+# and after it.  F5405 is left out because it changes no records.
+DEDUCTION_FUNCS = (FilingStatus, Adj, CapGains, SSBenefits, AGI, ItemDed,
+                   EI_FICA, AMED, StdDed)
+TAXINC_TO_AMTI_FUNCS = (TaxInc, XYZD, NonGain, TaxGains, MUI, AMTI)
+CREDIT_FUNCS = (F2441, DepCareBen, ExpEarnedInc, NumDep, ChildTaxCredit,
+                AmOppCr, LLC, RefAmOpp, NonEdCr, AddCTC, C1040, DEITC, IITAX,
+                ExpandIncome)
+
+# Dependency graphs of the above, built from the calc function signatures
+DEDUCTION_GRAPH = CalcGraph(DEDUCTION_FUNCS)
+TAXINC_TO_AMTI_GRAPH = CalcGraph(TAXINC_TO_AMTI_FUNCS)
+CREDIT_GRAPH = CalcGraph(CREDIT_FUNCS)
+
+# Dependency graph of all of the above, in the order calc_one_year first
+# runs them, and the policy parameters they read
+CALC_GRAPH = CalcGraph(DEDUCTION_FUNCS + TAXINC_TO_AMTI_FUNCS + CREDIT_FUNCS)
+CALC_PARAMETERS = sorted(set().union(*[CALC_GRAPH.parameters(func)
+                                       for func in CALC_GRAPH.funcs]) |
+                         set(['ID_BenefitSurtax_crt', 'ID_BenefitSurtax_trt',
+                              'ID_BenefitSurtax_Switch']))
+
+# Records variables set by the choice in calc_one_year between the standard
+# deduction and itemized deductions
+DEDUCTION_CHOICE_VARS = set(['_standard', 'c04470', 'c21060'])
+
+# Records variables that BenefitSurtax writes and those it reads
+BENEFIT_SURTAX_OUTPUTS = set(['_iitax', '_surtax'])
+BENEFIT_SURTAX_INPUTS = ['_iitax', 'c00100']
+
+# Graphs already pruned by pruned_graphs, keyed by the requested outputs
+_pruned_graphs = {}
+
+
+def pruned_graphs(outputs):
+    """
+    Return the deduction, TaxInc-to-AMTI and credit graphs pruned down to
+    the calc functions that calc_one_year must run to compute the given
+    records variables, along with whether it must choose between the
+    standard deduction and itemized deductions.
+
+    Parameters
+    ----------
+    outputs: iterable of records variable names
+
+    Returns
+    -------
+    tuple: (deduction graph, choose flag, TaxInc-to-AMTI graph, credit graph)
+    """
+    key = frozenset(outputs)
+    if key not in _pruned_graphs:
+        wanted = set(outputs)
+        credit = CREDIT_GRAPH.subgraph(wanted)
+        wanted |= credit.inputs
+        taxinc = TAXINC_TO_AMTI_GRAPH.subgraph(wanted)
+        wanted |= taxinc.inputs
+        # the deduction choice, which runs all the TaxInc_to_AMTI functions,
+        # is made only when the chosen deductions are needed
+        choose = bool(wanted & DEDUCTION_CHOICE_VARS)
+        if choose:
+            wanted |= TAXINC_TO_AMTI_GRAPH.inputs
+        deduction = DEDUCTION_GRAPH.subgraph(wanted)
+        _pruned_graphs[key] = (deduction, choose, taxinc, credit)
+    return _pruned_graphs[key]
+
+
+# Graphs already made by incremental_graphs, keyed by its arguments
+_incremental_graphs = {}
+
+
+def incremental_graphs(parameters, funcs=()):
+    """
+    Return the deduction, TaxInc-to-AMTI and credit graphs pruned down to
+    the calc functions that must be run again after the given policy
+    parameters change, when the records hold the results of a full
+    calculation made before the change, along with whether the choice
+    between the standard deduction and itemized deductions must be made
+    again.
+
+    Parameters
+    ----------
+    parameters: iterable of policy parameter names
+
+    funcs: iterable of calc functions that must be run again in any case
+
+    Returns
+    -------
+    tuple: (deduction graph, choose flag, TaxInc-to-AMTI graph, credit graph)
+    """
+    key = (frozenset(parameters), frozenset(funcs))
+    if key not in _incremental_graphs:
+        affected = set(CALC_GRAPH.affected_subgraph(parameters, funcs).funcs)
+        choose = bool(affected & set(TAXINC_TO_AMTI_FUNCS))
+        if choose:
+            # the records hold the chosen deductions, so the functions that
+            # compute the deductions to choose between must be run again
+            # along with all the TaxInc_to_AMTI functions
+            funcs = (set(funcs) | set(TAXINC_TO_AMTI_FUNCS) |
+                     set(CALC_GRAPH.subgraph(DEDUCTION_CHOICE_VARS).funcs))
+            affected = set(CALC_GRAPH.affected_subgraph(parameters,
+                                                        funcs).funcs)
+            taxinc = TAXINC_TO_AMTI_GRAPH
+        else:
+            taxinc = CalcGraph([])
+        deduction = CalcGraph(f for f in DEDUCTION_FUNCS if f in affected)
+        credit = CalcGraph(f for f in CREDIT_FUNCS if f in affected)
+        _incremental_graphs[key] = (deduction, choose, taxinc, credit)
+    return _incremental_graphs[key]
+
+
+# Kernel that computes the taxes of each record with the standard deduction
+# and with itemized deductions and keeps the results of the cheaper choice
+choose_deduction = fused_jit((), TAXINC_TO_AMTI_FUNCS, (), nopython=True)
+
+# Single-pass version of calc_one_year used by the 'fused' engine
+fused_calc_one_year = fused_jit(DEDUCTION_FUNCS, TAXINC_TO_AMTI_FUNCS,
+                                CREDIT_FUNCS, nopython=True)
+
+
 class Calculator(object):
+    """
+    Constructor for the federal tax Calculator class.
+
+    Parameters
+    ----------
+    policy: Policy class object
+
+    records: Records class object or string
+        string describes CSV file from which a Records object is created
+
+    sync_years: boolean
+        if True, Records data for PUF_YEAR are extrapolated to the
+        current_year of policy
+        default value is True
+
+    behavior: None or Behavior class object
+
+    growth: None or Growth class object
+
+    engine: string
+        'standard' runs each calc function over all records in turn;
+        'fused' runs all the calc functions of calc_one_year in a single
+        pass over the records and gives bit-identical results
+        default value is 'standard'
+
+    threads: integer
+        number of threads across which the records are split when the
+        calc functions run; the parallel kernels are compiled the first
+        time they are used; values above numba's thread limit, by default
+        the number of cores, are reduced to that limit
+        default value is 1, which runs the calc functions serially
+
+    workers: integer
+        number of calc functions that the 'standard' engine may run at the
+        same time when they do not depend on each other (see CalcGraph)
+        default value is 1, which runs the calc functions one at a time
+
+    kwargs: keyword arguments passed to Records.from_file
+
+    Raises
+    ------
+    ValueError:
+        if parameters are not the appropriate type.
+
+    Returns
+    -------
+    class instance: Calculator
+    """
+
+    ENGINES = ('standard', 'fused')
+
+    MTR_INCOME_TYPES = ('e00200p', 'e00900p', 'e00300', 'e23250', 'e01700',
+                        'e02400')
+    MTR_TAX_TYPES = ('fica', 'iit', 'combined')
 
     def __init__(self, policy=None, records=None,
-                 sync_years=True, behavior=None, growth=None, **kwargs):
+                 sync_years=True, behavior=None, growth=None,
+                 engine='standard', threads=1, workers=1, **kwargs):
+
+        if engine not in Calculator.ENGINES:
+            raise ValueError('engine must be one of {}'.format(
+                Calculator.ENGINES))
+        self.engine = engine
+
+        if not isinstance(threads, int) or threads < 1:
+            raise ValueError('threads must be a positive integer')
+        self.threads = threads
+
+        if not isinstance(workers, int) or workers < 1:
+            raise ValueError('workers must be a positive integer')
+        self.workers = workers
+
+        # year and policy parameter values of the last full calc_all
+        self._last_calc = None
 
         if isinstance(policy, Policy):
             self._policy = policy
@@ -85,80 +393,175 @@ class Calculator(object):
     def records(self):
         return self._records
 
+    def run_graph(self, graph):
+        graph.run(self.policy, self.records,
+                  workers=self.workers, threads=self.threads)
+
     def TaxInc_to_AMTI(self):
-        TaxInc(self.policy, self.records)
-        XYZD(self.policy, self.records)
-        NonGain(self.policy, self.records)
-        TaxGains(self.policy, self.records)
-        MUI(self.policy, self.records)
-        AMTI(self.policy, self.records)
-
-    def calc_one_year(self):
-        FilingStatus(self.policy, self.records)
-        Adj(self.policy, self.records)
-        CapGains(self.policy, self.records)
-        SSBenefits(self.policy, self.records)
-        AGI(self.policy, self.records)
-        ItemDed(self.policy, self.records)
-        EI_FICA(self.policy, self.records)
-        AMED(self.policy, self.records)
-        StdDed(self.policy, self.records)
-        # Store calculated standard deduction, calculate
-        # taxes with standard deduction, store AMT + Regular Tax
-        std = copy.deepcopy(self.records._standard)
-        item = copy.deepcopy(self.records.c04470)
-        item_no_limit = copy.deepcopy(self.records.c21060)
-        self.records.c04470 = np.zeros(self.records.dim)
-        self.records.c21060 = np.zeros(self.records.dim)
-        self.TaxInc_to_AMTI()
-        std_taxes = copy.deepcopy(self.records.c05800)
-        # Set standard deduction to zero, calculate taxes w/o
-        # standard deduction, and store AMT + Regular Tax
-        self.records._standard = np.zeros(self.records.dim)
-        self.records.c21060 = item_no_limit
-        self.records.c04470 = item
-        self.TaxInc_to_AMTI()
-        item_taxes = copy.deepcopy(self.records.c05800)
-        # Replace standard deduction with zero where the taxpayer
-        # would be better off itemizing
-        self.records._standard = np.where(item_taxes <
-                                          std_taxes,
-                                          0, std)
-        self.records.c04470 = np.where(item_taxes <
-                                       std_taxes,
-                                       item, 0)
-        self.records.c21060 = np.where(item_taxes <
-                                       std_taxes,
-                                       item_no_limit, 0)
-
-        # Calculate taxes with optimal itemized deduction
-        TaxInc(self.policy, self.records)
-        XYZD(self.policy, self.records)
-        NonGain(self.policy, self.records)
-        TaxGains(self.policy, self.records)
-        MUI(self.policy, self.records)
-        AMTI(self.policy, self.records)
-        F2441(self.policy, self.records)
-        DepCareBen(self.policy, self.records)
-        ExpEarnedInc(self.policy, self.records)
-        NumDep(self.policy, self.records)
-        ChildTaxCredit(self.policy, self.records)
-        AmOppCr(self.policy, self.records)
-        LLC(self.policy, self.records)
-        RefAmOpp(self.policy, self.records)
-        NonEdCr(self.policy, self.records)
-        AddCTC(self.policy, self.records)
-        F5405(self.policy, self.records)
-        C1040(self.policy, self.records)
-        DEITC(self.policy, self.records)
-        IITAX(self.policy, self.records)
-        ExpandIncome(self.policy, self.records)
-
-    def calc_all(self):
-        self.calc_one_year()
+        self.run_graph(TAXINC_TO_AMTI_GRAPH)
+
+    def calc_one_year(self, outputs=None):
+        """
+        Calculate the taxes of every record for the current year.
+
+        Parameters
+        ----------
+        outputs: None or iterable of records variable names
+            if given, run only the calc functions needed to compute these
+            variables; other calculated variables may be left stale
+            this option is ignored by the 'fused' engine
+            default value is None, which computes every variable
+
+        Raises
+        ------
+        ValueError:
+            if any of outputs is not a records variable.
+        """
+        # the records no longer hold the results of a full calc_all
+        self._last_calc = None
+        if self.engine == 'fused':
+            self.records.own(CALC_GRAPH.outputs)
+            fused_calc_one_year(self.policy, self.records,
+                                threads=self.threads)
+            return
+        if outputs is None:
+            self.run_stages(DEDUCTION_GRAPH, True, TAXINC_TO_AMTI_GRAPH,
+                            CREDIT_GRAPH)
+        else:
+            for name in outputs:
+                if not hasattr(self.records, name):
+                    msg = 'output "{}" is not a records variable'
+                    raise ValueError(msg.format(name))
+            self.run_stages(*pruned_graphs(outputs))
+
+    def run_stages(self, deduction, choose, taxinc, credit):
+        """
+        Run the given deduction graph, then the choice between the standard
+        deduction and itemized deductions if choose is True or else the
+        given TaxInc-to-AMTI graph, and then the given credit graph.
+        """
+        # arrays shared with a fork are copied only if they are written
+        written = deduction.outputs | credit.outputs
+        if choose:
+            written |= TAXINC_TO_AMTI_GRAPH.outputs | DEDUCTION_CHOICE_VARS
+        else:
+            written |= taxinc.outputs
+        self.records.own(written)
+        self.run_graph(deduction)
+        if choose:
+            choose_deduction(self.policy, self.records, threads=self.threads)
+        else:
+            self.run_graph(taxinc)
+        self.run_graph(credit)
+
+    def calc_all(self, outputs=None):
+        """
+        Calculate the taxes of every record for the current year,
+        including the benefit surtax.
+
+        Parameters
+        ----------
+        outputs: None or iterable of records variable names
+            if given, compute only these variables (see calc_one_year)
+            default value is None, which computes every variable
+        """
+        if outputs is not None:
+            outputs = set(outputs)
+            if not outputs & BENEFIT_SURTAX_OUTPUTS:
+                self.calc_one_year(outputs)
+                return
+            outputs.update(BENEFIT_SURTAX_INPUTS)
+        self.calc_one_year(outputs)
         BenefitSurtax(self)
+        if outputs is None:
+            self._last_calc = (self.current_year, self.calc_parameters())
+
+    def calc_parameters(self):
+        """
+        Return a dictionary of copies of the current values of the policy
+        parameters read by calc_all.
+        """
+        return dict((name, copy.deepcopy(getattr(self.policy, name)))
+                    for name in CALC_PARAMETERS)
+
+    def recalc_all(self):
+        """
+        Calculate the taxes of every record for the current year after a
+        change to the policy parameters, running again only the calc
+        functions affected by the parameters that have changed since the
+        last full calc_all.  The records must not have been changed since
+        that calc_all.  If there was no full calc_all for the current
+        year, or the last calculation was not a full calc_all, this does
+        a full calc_all.
+
+        Returns
+        -------
+        nothing: void
+        """
+        if (self._last_calc is None or
+                self._last_calc[0] != self.current_year):
+            self.calc_all()
+            return
+        last_values = self._last_calc[1]
+        values = self.calc_parameters()
+        changed = [name for name in CALC_PARAMETERS
+                   if not np.array_equal(values[name], last_values[name])]
+        # BenefitSurtax adds to _iitax, so _iitax must be computed again
+        # whenever the surtax applies now or applied before
+        if (self.policy.ID_BenefitSurtax_crt != 1 or
+                last_values['ID_BenefitSurtax_crt'] != 1):
+            funcs = (IITAX,)
+        else:
+            funcs = ()
+        self._last_calc = None
+        self.run_stages(*incremental_graphs(changed, funcs))
+        BenefitSurtax(self)
+        self._last_calc = (self.current_year, values)
+
+    def calc_reforms(self, reforms, outputs=('_iitax', '_fica', '_combined')):
+        """
+        Calculate the taxes of every record for the current year under
+        each of several policy reforms of this Calculator's policy.
+          Each reform is evaluated in a fork of this Calculator (see the
+        fork method), so the records arrays the reform does not change are
+        shared rather than copied, and by the recalc_all method, so only
+        the calc functions affected by the parameters the reform changes
+        are run again after one full calc_all of this Calculator.
+          This is a convenience wrapper around those methods: the reforms
+        are calculated one after another, each in its own passes over the
+        records, so a reform of parameters read by the early calc
+        functions, such as those the choice between the standard and
+        itemized deductions depends on, costs about as much as calc_all.
+
+        Parameters
+        ----------
+        reforms: list of reform dictionaries
+            each in the format accepted by Policy.implement_reform
+
+        outputs: iterable of records variable names
+            default value is ('_iitax', '_fica', '_combined')
+
+        Returns
+        -------
+        dictionary mapping each of outputs to an array with one row for
+        every reform and one column for every record
+        """
+        year = self.current_year
+        if self._last_calc is None or self._last_calc[0] != year:
+            self.calc_all()
+        results = dict((name, np.empty((len(reforms), self.records.dim)))
+                       for name in outputs)
+        for row, reform in enumerate(reforms):
+            calc = self.fork()
+            calc.policy.implement_reform(reform)
+            calc.policy.set_year(year)
+            calc.recalc_all()
+            for name in outputs:
+                results[name][row] = getattr(calc.records, name)
+        return results
 
     def calc_all_test(self):
+        self.records.own(CALC_GRAPH.outputs)
         all_dfs = []
         add_df(all_dfs, FilingStatus(self.policy, self.records))
         add_df(all_dfs, Adj(self.policy, self.records))
@@ -193,7 +596,65 @@ class Calculator(object):
         totaldf = pd.concat(all_dfs, axis=1)
         return totaldf
 
+    def fork(self):
+        """
+        Return a copy of this Calculator whose records share their arrays
+        with the records of this Calculator, each array being copied only
+        when one of the two is about to change it in place (see
+        Records.fork), and whose policy, behavior and growth objects, which
+        are small, are copies of this Calculator's.
+        """
+        calc = copy.copy(self)
+        calc._policy = copy.deepcopy(self.policy)
+        calc.behavior = copy.deepcopy(self.behavior)
+        calc.growth = copy.deepcopy(self.growth)
+        calc._records = self.records.fork()
+        return calc
+
     def increment_year(self):
+        self._apply_growth(self.policy.current_year + 1)
+        self.records.increment_year()
+        self.policy.set_year(self.policy.current_year + 1)
+        self.behavior.set_year(self.policy.current_year)
+
+    def advance_to_year(self, year):
+        """
+        Move this Calculator forward to the given year, giving the same
+        results, up to rounding, as calling increment_year once for every
+        year up to it.  The growth adjustment or target of every one of
+        those years is applied to the blowup factors first, and then the
+        records data are extrapolated to the given year in one pass (see
+        Records.advance_to_year), so each year of a budget window can be
+        reached directly from the same starting Calculator.
+
+        Parameters
+        ----------
+        year: integer
+            later than current_year
+
+        Raises
+        ------
+        ValueError:
+            if year is not later than current_year.
+
+        Returns
+        -------
+        nothing: void
+        """
+        if year <= self.current_year:
+            msg = 'year {} is not later than current_year {}'
+            raise ValueError(msg.format(year, self.current_year))
+        for next_year in range(self.current_year + 1, year + 1):
+            self._apply_growth(next_year)
+        self.records.advance_to_year(year)
+        self.policy.set_year(year)
+        self.behavior.set_year(year)
+
+    def _apply_growth(self, year):
+        """
+        Apply the growth adjustment or target to the blowup factors of the
+        given year before the records data are extrapolated to it.
+        """
         if self.growth.factor_adjustment != 0:
             if not np.array_equal(self.growth._factor_target,
                                   self.growth.REAL_GDP_GROWTH):
@@ -201,16 +662,11 @@ class Calculator(object):
                        cannot be non-zero at the same time"
                 raise ValueError(msg)
             else:
-                adjustment(self, self.growth.factor_adjustment,
-                           self.policy.current_year + 1)
+                adjustment(self, self.growth.factor_adjustment, year)
         elif not np.array_equal(self.growth._factor_target,
                                 self.growth.REAL_GDP_GROWTH):
             target(self, self.growth._factor_target,
-                   self.policy.inflation_rates,
-                   self.policy.current_year + 1)
-        self.records.increment_year()
-        self.policy.set_year(self.policy.current_year + 1)
-        self.behavior.set_year(self.policy.current_year)
+                   self.policy.inflation_rates, year)
 
     @property
     def current_year(self):
@@ -259,67 +715,213 @@ class Calculator(object):
         'e01700',  federally-taxable pension benefits; and
         'e02400',  social security (OASDI) benefits.
         """
-        mtr_valid_income_types = ['e00200p', 'e00900p',
-                                  'e00300', 'e23250',
-                                  'e01700', 'e02400']
         # check validity of income_type_str parameter
-        if income_type_str not in mtr_valid_income_types:
+        if income_type_str not in Calculator.MTR_INCOME_TYPES:
             msg = 'mtr income_type_str="{}" is not valid'
             raise ValueError(msg.format(income_type_str))
+        mtrs = self.mtrs([income_type_str], wrt_full_compensation)
+        return tuple(mtrs[income_type_str][tax_type].values
+                     for tax_type in Calculator.MTR_TAX_TYPES)
+
+    def mtrs(self, income_types=None, wrt_full_compensation=True):
+        """
+        Calculates the marginal FICA, individual income, and combined
+        tax rates for every tax filing unit with respect to each of several
+        types of income, in the same way as the mtr method.
+          The taxes at the current level of income are calculated once,
+        leaving the embedded records object with the results of that
+        calculation.  The taxes after a small increase in each of the
+        income types are then all calculated in one batched calculation
+        over a copy of the records that holds the records once for each
+        income type, so the embedded records object is never changed to
+        compute them.  Only the variables the calculation reads before it
+        writes them, or never writes, are copied into it; the others start
+        out as zeros.
+
+        Parameters
+        ----------
+        income_types: None or list of strings
+            specifies the types of income that are increased to compute
+            the marginal tax rates.  See the mtr method for the list of
+            valid income types.
+            default value is None, which uses all valid income types
+
+        wrt_full_compensation: boolean
+            as in the mtr method
+
+        Returns
+        -------
+        DataFrame with one row for every tax filing unit and one column
+        for every income type and tax type ('fica', 'iit' or 'combined'),
+        with the income type in the first level of the column index.
+        """
+        if income_types is None:
+            income_types = list(Calculator.MTR_INCOME_TYPES)
+        for income_type_str in income_types:
+            if income_type_str not in Calculator.MTR_INCOME_TYPES:
+                msg = 'mtrs income type "{}" is not valid'
+                raise ValueError(msg.format(income_type_str))
         # specify value for finite_diff parameter
         finite_diff = 0.01  # a one-cent difference
-        # extract income_type array(s) from embedded records object
-        income_type = getattr(self.records, income_type_str)
-        if income_type_str == 'e00200p':
-            earnings_type = self.records.e00200
-        elif income_type_str == 'e00900p':
-            seincome_type = self.records.e00900
         # calculate base level of taxes
         self.calc_all()
-        fica_base = copy.deepcopy(self.records._fica)
-        iitax_base = copy.deepcopy(self.records._iitax)
+        fica_base = self.records._fica
+        iitax_base = self.records._iitax
         combined_taxes_base = iitax_base + fica_base
-        # calculate level of taxes after a marginal increase in income
-        setattr(self.records, income_type_str, income_type + finite_diff)
-        if income_type_str == 'e00200p':
-            self.records.e00200 = earnings_type + finite_diff
-        elif income_type_str == 'e00900p':
-            self.records.e00900 = seincome_type + finite_diff
-        self.calc_all()
-        fica_up = copy.deepcopy(self.records._fica)
-        iitax_up = copy.deepcopy(self.records._iitax)
-        combined_taxes_up = iitax_up + fica_up
-        # compute marginal changes in tax liability
-        fica_delta = fica_up - fica_base
-        iitax_delta = iitax_up - iitax_base
-        combined_delta = combined_taxes_up - combined_taxes_base
-        # return embedded records object to its original state and recalculate
-        setattr(self.records, income_type_str, income_type)
-        if income_type_str == 'e00200p':
-            self.records.e00200 = earnings_type
-        elif income_type_str == 'e00900p':
-            self.records.e00900 = seincome_type
-        self.calc_all()
-        # specify optional adjustment for employer (er) OASDI+HI payroll taxes
-        if wrt_full_compensation and income_type_str == 'e00200p':
-            adj = np.where(income_type <
-                           self.policy.SS_Earnings_c,
-                           0.5 * (self.policy.FICA_ss_trt +
-                                  self.policy.FICA_mc_trt),
-                           0.5 * self.policy.FICA_mc_trt)
+        # calculate level of taxes after a marginal increase in each type
+        # of income, each in its own copy of the records
+        dim = self.records.dim
+        stacked = copy.copy(self)
+        written = ((CALC_GRAPH.outputs | BENEFIT_SURTAX_OUTPUTS) -
+                   CALC_GRAPH.initial_inputs)
+        stacked._records = self.records.tiled(
+            len(income_types),
+            names=[name for name in self.records.__dict__
+                   if name not in written])
+        for block, income_type_str in enumerate(income_types):
+            names = [income_type_str]
+            if income_type_str == 'e00200p':
+                names.append('e00200')
+            elif income_type_str == 'e00900p':
+                names.append('e00900')
+            for name in names:
+                # replace rather than change the array, which may be
+                # shared with another variable
+                income = getattr(stacked.records, name).astype(np.float64)
+                income[block * dim:(block + 1) * dim] += finite_diff
+                setattr(stacked.records, name, income)
+        stacked.calc_all()
+        columns = []
+        for block, income_type_str in enumerate(income_types):
+            rows = slice(block * dim, (block + 1) * dim)
+            fica_up = stacked.records._fica[rows]
+            iitax_up = stacked.records._iitax[rows]
+            combined_taxes_up = iitax_up + fica_up
+            # compute marginal changes in tax liability
+            fica_delta = fica_up - fica_base
+            iitax_delta = iitax_up - iitax_base
+            combined_delta = combined_taxes_up - combined_taxes_base
+            # specify optional adjustment for employer (er) OASDI+HI payroll
+            # taxes
+            if wrt_full_compensation and income_type_str == 'e00200p':
+                adj = np.where(self.records.e00200p <
+                               self.policy.SS_Earnings_c,
+                               0.5 * (self.policy.FICA_ss_trt +
+                                      self.policy.FICA_mc_trt),
+                               0.5 * self.policy.FICA_mc_trt)
+            else:
+                adj = 0.0
+            # compute marginal tax rates
+            columns.append(fica_delta / (finite_diff * (1.0 + adj)))
+            columns.append(iitax_delta / (finite_diff * (1.0 + adj)))
+            columns.append(combined_delta / (finite_diff * (1.0 + adj)))
+        header = pd.MultiIndex.from_product([income_types,
+                                             Calculator.MTR_TAX_TYPES])
+        return DataFrame(data=np.column_stack(columns), columns=header)
+
+    def run_budget_window(self, years=None,
+                          outputs=('_iitax', '_fica', '_combined'),
+                          record_results=False, processes=None):
+        """
+        Calculate the taxes in each year of a budget window, computing the
+        years at the same time in a pool of worker processes.
+          Each year is computed from this Calculator, which is left
+        unchanged, by moving a fork of it directly to the year (see the
+        advance_to_year method) and calling calc_all.  The workers are new
+        processes rather than forks of this one, because forking a process
+        in which a multi-threaded calc function has run can hang it, and
+        they attach to the records arrays of this Calculator through shared
+        memory (see the Records share method) rather than receiving copies
+        of them.  Each worker compiles the calc functions it runs unless
+        the TAXCALC_CACHE_DIR kernel cache lets it load them.
+
+        Parameters
+        ----------
+        years: None or iterable of integers
+            None implies the Policy.NUM_BUDGET_YEARS years starting with
+            current_year, or as many of them as the policy covers;
+            otherwise none of the years may be earlier than current_year
+            default value is None
+
+        outputs: iterable of records variable names
+            default value is ('_iitax', '_fica', '_combined')
+
+        record_results: boolean
+            True implies the value of each of outputs for every record is
+            returned too
+            default value is False
+
+        processes: None or integer
+            number of worker processes; None implies one for each year, up
+            to the number of CPUs, and 1 implies the years are computed one
+            after another in this process
+            default value is None
+
+        Raises
+        ------
+        ValueError:
+            if any of years is earlier than current_year.
+
+        Returns
+        -------
+        dictionary with the key 'aggregate' mapped to a DataFrame holding
+        the weighted total of each of outputs (columns) in each year
+        (index), and, if record_results, the key 'records' mapped to a
+        dictionary that maps each of outputs to an array with one row for
+        every year and one column for every record
+        """
+        if years is None:
+            last_year = min(self.current_year + Policy.NUM_BUDGET_YEARS - 1,
+                            self.policy.end_year)
+            years = range(self.current_year, last_year + 1)
+        years = list(years)
+        if any(year < self.current_year for year in years):
+            msg = 'years must not be earlier than current_year {}'
+            raise ValueError(msg.format(self.current_year))
+        outputs = list(outputs)
+        tasks = [(year, outputs, record_results) for year in years]
+        if processes is None:
+            processes = min(len(years), multiprocessing.cpu_count())
+        if processes <= 1:
+            _init_budget_window(self)
+            try:
+                year_results = [_calc_budget_year(task) for task in tasks]
+            finally:
+                _init_budget_window(None)
         else:
-            adj = 0.0
-        # compute marginal tax rates
-        mtr_fica = fica_delta / (finite_diff * (1.0 + adj))
-        mtr_iit = iitax_delta / (finite_diff * (1.0 + adj))
-        mtr_combined = combined_delta / (finite_diff * (1.0 + adj))
-        # return the three marginal tax rate arrays
-        return (mtr_fica, mtr_iit, mtr_combined)
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('forkserver')
+            else:
+                context = multiprocessing.get_context('spawn')
+            # the workers attach to the shared records arrays instead of
+            # unpickling copies of them
+            records_path = self.records.share()
+            base = copy.copy(self)
+            base._records = None
+            try:
+                pool = context.Pool(processes,
+                                    initializer=_init_budget_window,
+                                    initargs=(base, records_path))
+                try:
+                    year_results = pool.map(_calc_budget_year, tasks)
+                finally:
+                    pool.close()
+                    pool.join()
+            finally:
+                Records.release(records_path)
+        results = {'aggregate': DataFrame([totals for totals, _
+                                           in year_results],
+                                          index=years, columns=outputs)}
+        if record_results:
+            results['records'] = dict(
+                (name, np.array([values[name] for _, values in year_results]))
+                for name in outputs)
+        return results
 
     def diagnostic_table(self, num_years=5):
         table = []
         row_years = []
-        calc = copy.deepcopy(self)
+        calc = self.fork()
 
         for i in range(0, num_years):
             calc.calc_all()
@@ -422,3 +1024,37 @@ class Calculator(object):
         pd.options.display.float_format = '{:8,.1f}'.format
 
         return df
+
+
+# Calculator whose budget window is being computed by run_budget_window
+_budget_window_calc = None
+
+
+def _init_budget_window(calc, records_path=None):
+    """
+    Set the Calculator from which _calc_budget_year computes each year,
+    attaching it to the records shared at records_path if that is given.
+    """
+    global _budget_window_calc
+    if records_path is not None:
+        calc._records = Records.attach(records_path)
+    _budget_window_calc = calc
+
+
+def _calc_budget_year(task):
+    """
+    Compute one year of the budget window of run_budget_window, returning
+    the weighted totals of the outputs and, if requested, their values.
+    """
+    year, outputs, record_results = task
+    calc = _budget_window_calc.fork()
+    if year > calc.current_year:
+        calc.advance_to_year(year)
+    calc.calc_all()
+    totals = [(getattr(calc.records, name) * calc.records.s006).sum()
+              for name in outputs]
+    values = {}
+    if record_results:
+        values = dict((name, getattr(calc.records, name))
+                      for name in outputs)
+    return totals, values
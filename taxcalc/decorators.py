@@ -1,7 +1,12 @@
+import os
 import numpy as np
 import pandas as pd
 import inspect
+import hashlib
+import tempfile
+import numba
 from .policy import Policy
+from .parameters_base import ParametersBase
 from numba import jit, vectorize, guvectorize
 from functools import wraps
 from six import StringIO
@@ -9,6 +14,16 @@ import ast
 import toolz
 
 
+# Directory in which compiled kernels are kept between processes.  Kernel
+# caching is enabled by setting the TAXCALC_CACHE_DIR environment variable
+# before taxcalc is imported.  Both the calc functions and the generated
+# apply functions are then compiled with numba's cache=True, so numba keys
+# each cached kernel on its source and its argument types.
+KERNEL_CACHE_DIR = os.environ.get('TAXCALC_CACHE_DIR')
+if KERNEL_CACHE_DIR and not numba.config.CACHE_DIR:
+    numba.config.CACHE_DIR = KERNEL_CACHE_DIR
+
+
 class GetReturnNode(ast.NodeVisitor):
     """
     A Visitor to get the return tuple names from a calc-style function
@@ -73,7 +88,7 @@ def dataframe_wrap_guvectorize(dtype_args, dtype_sig):
     return make_wrapper
 
 
-def create_apply_function_string(sigout, sigin, parameters):
+def create_apply_function_string(sigout, sigin, parameters, parallel=False):
     """
     Create a string for a function of the form::
 
@@ -83,7 +98,9 @@ def create_apply_function_string(sigout, sigin, parameters):
             return x_0[i], ...
 
     where the specific args to jitted_f and the number of
-    values to return is determined by sigout and sigin
+    values to return is determined by sigout and sigin.  When parallel is
+    True the loop is written with prange instead of range so that numba
+    can split the records across threads.
 
     Parameters
     ----------
@@ -95,6 +112,8 @@ def create_apply_function_string(sigout, sigin, parameters):
                 variables (as opposed to column records). This influences
                 how we construct the '_apply' function
 
+    parallel: Bool, if True, loop over the records with prange
+
     Returns
     -------
     a String representing the function
@@ -106,7 +125,8 @@ def create_apply_function_string(sigout, sigin, parameters):
     in_args = ["x_" + str(i) for i in range(len(sigout), total_len)]
 
     s.write("def ap_func({0}):\n".format(",".join(out_args + in_args)))
-    s.write("  for i in range(len(x_0)):\n")
+    s.write("  for i in {}(len(x_0)):\n".format("prange" if parallel
+                                                else "range"))
 
     out_index = [x + "[i]" for x in out_args]
     in_index = []
@@ -120,7 +140,7 @@ def create_apply_function_string(sigout, sigin, parameters):
 
 
 def create_toplevel_function_string(args_out, args_in, pm_or_pf,
-                                    kwargs_for_func={}):
+                                    kwargs_for_func={}, return_df=True):
     """
     Create a string for a function of the form::
 
@@ -130,7 +150,9 @@ def create_toplevel_function_string(args_out, args_in, pm_or_pf,
             return DataFrame(data, columns=header)
 
     where the specific args to jitted_f and the number of
-    values to return is destermined by sigout and sigin
+    values to return is destermined by sigout and sigin.  When return_df
+    is False the function only writes the outputs back to their holders
+    and returns nothing, so no DataFrame is built.
 
     Parameters
     ----------
@@ -142,6 +164,8 @@ def create_toplevel_function_string(args_out, args_in, pm_or_pf,
 
     kwargs_for_func: dictionary of keyword args for the function
 
+    return_df: Bool, if True, return the outputs in a DataFrame
+
     Returns
     -------
     a String representing the function
@@ -157,9 +181,10 @@ def create_toplevel_function_string(args_out, args_in, pm_or_pf,
         s.write(", " + kwargs + " ")
 
     s.write("):\n")
-    s.write("    from pandas import DataFrame\n")
-    s.write("    import numpy as np\n")
-    s.write("    outputs = \\\n")
+    if return_df:
+        s.write("    from pandas import DataFrame\n")
+        s.write("    import numpy as np\n")
+        s.write("    outputs = \\\n")
     outs = []
     for arg in kwargs_for_func:
         args_in.remove(arg)
@@ -175,6 +200,9 @@ def create_toplevel_function_string(args_out, args_in, pm_or_pf,
         s.write(arg + ", ")
     s.write(")\n")
 
+    if not return_df:
+        return s.getvalue()
+
     s.write("    header = [")
     col_headers = ["'" + out + "'" for out in args_out]
     s.write(", ".join(col_headers))
@@ -189,8 +217,50 @@ def create_toplevel_function_string(args_out, args_in, pm_or_pf,
     return s.getvalue()
 
 
+def apply_function_source_file(func, apfunc, cache_dir):
+    """
+    Write the source of a generated '_apply' style function to a file in
+    cache_dir and return the file's path.  numba can only cache functions
+    whose source lives in a file, so this file is what the apply function
+    is compiled from when kernel caching is enabled.
+
+    The file name is a hash of the apply function source and of the whole
+    module that defines func, so any change to a calc function (or to the
+    helpers it calls) produces a new file and hence a fresh cache entry.
+    An existing file is never rewritten because numba invalidates a cache
+    entry whenever the timestamp of its source file changes.
+
+    Parameters
+    ----------
+    func: the 'calc' style function
+
+    apfunc: source string of the apply function for func
+
+    cache_dir: directory in which the source file is kept
+
+    Returns
+    -------
+    path of the source file
+    """
+    hasher = hashlib.sha1(apfunc.encode('utf-8'))
+    hasher.update(func.__name__.encode('utf-8'))
+    with open(inspect.getsourcefile(func), 'rb') as src_file:
+        hasher.update(src_file.read())
+    path = os.path.join(cache_dir, 'ap_{}.py'.format(hasher.hexdigest()))
+    if not os.path.exists(path):
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        # write to a temporary file first so that concurrent processes
+        # never see a partially written source file
+        fd, tmp_path = tempfile.mkstemp(suffix='.py', dir=cache_dir)
+        with os.fdopen(fd, 'w') as tmp_file:
+            tmp_file.write(apfunc)
+        os.rename(tmp_path, path)
+    return path
+
+
 def make_apply_function(func, out_args, in_args, parameters, do_jit=True,
-                        **kwargs):
+                        parallel=False, **kwargs):
     """
     Takes a '_calc' function and creates the necessary Python code for an
     _apply style function. Will also jit the function if desired
@@ -209,21 +279,67 @@ def make_apply_function(func, out_args, in_args, parameters, do_jit=True,
 
     do_jit: Bool, if True, jit the resulting apply function
 
+    parallel: Bool, if True, make an apply function that splits the records
+              across threads and releases the GIL while it runs
+
     Returns
     -------
     '_apply' style function
 
     """
+    if KERNEL_CACHE_DIR:
+        kwargs['cache'] = True
     jitted_f = jit(**kwargs)(func)
-    apfunc = create_apply_function_string(out_args, in_args, parameters)
+    apfunc = create_apply_function_string(out_args, in_args, parameters,
+                                          parallel=parallel)
 
-    func_code = compile(apfunc, "<string>", "exec")
+    if KERNEL_CACHE_DIR and do_jit:
+        filename = apply_function_source_file(func, apfunc, KERNEL_CACHE_DIR)
+    else:
+        filename = "<string>"
+    func_code = compile(apfunc, filename, "exec")
     fakeglobals = {}
-    eval(func_code, {"jitted_f": jitted_f}, fakeglobals)
-    if do_jit:
-        return jit(**kwargs)(fakeglobals['ap_func'])
+    # __name__ lets numba rebuild the environment of a cached kernel
+    eval(func_code, {"jitted_f": jitted_f, "prange": numba.prange,
+                     "__name__": func.__module__}, fakeglobals)
+    if do_jit and parallel:
+        ap_func = jit(parallel=True, nogil=True,
+                      **kwargs)(fakeglobals['ap_func'])
+    elif do_jit:
+        # release the GIL in nopython mode so that calc functions which do
+        # not depend on each other can run at the same time (see CalcGraph)
+        ap_func = jit(nogil=kwargs.get('nopython', False),
+                      **kwargs)(fakeglobals['ap_func'])
     else:
-        return fakeglobals['ap_func']
+        ap_func = fakeglobals['ap_func']
+    # keep the jitted calc function for engines that call it directly
+    ap_func.jitted_f = jitted_f
+    return ap_func
+
+
+def call_with_threads(threads, func, *args, **kwargs):
+    """
+    Call func(*args, **kwargs) with numba's parallel loops limited to the
+    given number of threads, restoring the previous limit afterwards.
+
+    Parameters
+    ----------
+    threads: number of threads; values above numba's thread limit
+             (numba.config.NUMBA_NUM_THREADS, by default the number of
+             cores) are reduced to that limit
+
+    func: function to call
+
+    Returns
+    -------
+    whatever func returns
+    """
+    previous = numba.get_num_threads()
+    numba.set_num_threads(min(threads, numba.config.NUMBA_NUM_THREADS))
+    try:
+        return func(*args, **kwargs)
+    finally:
+        numba.set_num_threads(previous)
 
 
 def apply_jit(dtype_sig_out, dtype_sig_in, parameters=None, **kwargs):
@@ -265,12 +381,48 @@ def apply_jit(dtype_sig_out, dtype_sig_in, parameters=None, **kwargs):
     return make_wrapper
 
 
+# Names that iterate_jit treats as parameters: the policy parameters, with
+# and without their leading underscore, and the special 'puf' flag.  They
+# are found once, the first time a calc function is decorated.
+_ALLOWED_PARAMETERS = None
+
+
+def allowed_parameter_names():
+    """
+    Return the frozenset of names that, as arguments of an iterate_jit
+    calc function, are parameters rather than records variables.
+    """
+    global _ALLOWED_PARAMETERS
+    if _ALLOWED_PARAMETERS is None:
+        dd_key_list = list(Policy.default_data(metadata=True).keys())
+        allowed = set(dd_key_list)
+        allowed.update(arg[1:] for arg in dd_key_list)
+        allowed.add("puf")
+        _ALLOWED_PARAMETERS = frozenset(allowed)
+    return _ALLOWED_PARAMETERS
+
+
 def iterate_jit(parameters=None, **kwargs):
     """
     make a decorator that takes in a _calc-style function, create a
     function that handles the "high-level" function and the "_apply"
     style function
 
+    The resulting function takes an optional threads keyword argument.
+    With threads greater than one it runs a parallel version of the apply
+    function, compiled the first time it is needed, on that many threads.
+
+    It also takes an optional return_df keyword argument.  By default the
+    outputs are written back to the records and also returned in a
+    DataFrame; with return_df=False they are only written back, which
+    avoids copying every output column into the DataFrame.
+
+    Decorating a function is not entirely lazy: it still reads and parses
+    the source of the function to find the names it returns, because
+    CalcGraph needs what each function reads and writes when calculate is
+    imported.  Only its apply functions are made and jitted lazily, the
+    first time they are needed.
+
     Note: perhaps a better "bigger picture" description of what this does?
     """
     if not parameters:
@@ -295,10 +447,7 @@ def iterate_jit(parameters=None, **kwargs):
         # Any name that is a parameter (or the special case 'puf')
         # Boolean flag is given special treatment.
         # Identify those names here
-        dd_key_list = list(Policy.default_data(metadata=True).keys())
-        allowed_parameters = dd_key_list
-        allowed_parameters += list(arg[1:] for arg in dd_key_list)
-        allowed_parameters.append("puf")
+        allowed_parameters = allowed_parameter_names()
         additional_parameters = [arg for arg in in_args if
                                  arg in allowed_parameters]
         additional_parameters += parameters
@@ -320,41 +469,346 @@ def iterate_jit(parameters=None, **kwargs):
         if not all_out_args:
             raise ValueError("Can't find return statement in function!")
 
-        # Now create the apply jitted function
-        applied_jitted_f = make_apply_function(func,
-                                               list(reversed(all_out_args)),
-                                               in_args,
-                                               parameters=all_parameters,
-                                               do_jit=True,
-                                               **kwargs_for_jit)
+        # Apply jitted functions, keyed by whether they are the parallel
+        # version, each made on first use
+        apply_fns = {}
 
-        def wrapper(*args, **kwargs):
-            in_arrays = []
-            out_arrays = []
-            pm_or_pf = []
-            for farg in all_out_args + in_args:
-                if hasattr(args[0], farg):
-                    in_arrays.append(getattr(args[0], farg))
-                    pm_or_pf.append("pm")
-                elif hasattr(args[1], farg):
-                    in_arrays.append(getattr(args[1], farg))
-                    pm_or_pf.append("pf")
-                elif farg not in kwargs_for_func:
-                    raise ValueError("Unknown arg: " + farg)
-
-            # Create the high level function
-            high_level_func = create_toplevel_function_string(all_out_args,
-                                                              list(in_args),
-                                                              pm_or_pf,
-                                                              kwargs_for_func)
-            func_code = compile(high_level_func, "<string>", "exec")
-            fakeglobals = {}
-            eval(func_code, {"applied_f": applied_jitted_f}, fakeglobals)
-            high_level_fn = fakeglobals['hl_func']
+        def apply_function(parallel=False):
+            if parallel not in apply_fns:
+                apply_fns[parallel] = make_apply_function(
+                    func, list(reversed(all_out_args)), in_args,
+                    parameters=all_parameters, do_jit=True,
+                    parallel=parallel, **kwargs_for_jit)
+            return apply_fns[parallel]
+
+        def jitted_function():
+            return apply_function().jitted_f
+
+        # Object ('pm' or 'pf') that holds each of the arguments, keyed by
+        # the parameter names of pm and the class of pf
+        holders = {}
 
+        # High level functions already compiled for this function, keyed
+        # by the object ('pm' or 'pf') that holds each of the arguments,
+        # by whether they use the parallel apply function and by whether
+        # they return a DataFrame
+        high_level_fns = {}
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            threads = kwargs.pop('threads', 1)
+            return_df = kwargs.pop('return_df', True)
+            parallel = threads > 1
+            if isinstance(args[0], ParametersBase):
+                # which of pm and pf holds each argument depends only on
+                # the parameters in the block of pm and on the class of pf
+                holders_key = (args[0].parameter_names, type(args[1]))
+            else:
+                holders_key = None
+            pm_or_pf = holders.get(holders_key)
+            if pm_or_pf is None:
+                pm_or_pf = []
+                for farg in all_out_args + in_args:
+                    if hasattr(args[0], farg):
+                        pm_or_pf.append("pm")
+                    elif hasattr(args[1], farg):
+                        pm_or_pf.append("pf")
+                    elif farg not in kwargs_for_func:
+                        raise ValueError("Unknown arg: " + farg)
+                pm_or_pf = tuple(pm_or_pf)
+                if holders_key is not None:
+                    holders[holders_key] = pm_or_pf
+            layout = (pm_or_pf, parallel, return_df)
+
+            # Create the high level function the first time this layout
+            # is seen and reuse it on every later call
+            high_level_fn = high_level_fns.get(layout)
+            if high_level_fn is None:
+                high_level_func = create_toplevel_function_string(
+                    all_out_args, list(in_args), pm_or_pf, kwargs_for_func,
+                    return_df=return_df)
+                func_code = compile(high_level_func, "<string>", "exec")
+                fakeglobals = {}
+                eval(func_code, {"applied_f": apply_function(parallel)},
+                     fakeglobals)
+                high_level_fn = fakeglobals['hl_func']
+                high_level_fns[layout] = high_level_fn
+
+            if parallel:
+                return call_with_threads(threads, high_level_fn,
+                                         *args, **kwargs)
             ans = high_level_fn(*args, **kwargs)
             return ans
 
+        # Expose what the function reads and writes so that engines which
+        # combine several calc functions can call the jitted function
+        wrapper.jitted_function = jitted_function
+        wrapper.out_args = all_out_args
+        wrapper.in_args = in_args
+        wrapper.parameters = all_parameters
+        wrapper.kwargs_for_func = kwargs_for_func
         return wrapper
 
     return make_wrapper
+
+
+def create_fused_function_string(before, taxinc_to_amti, after,
+                                 record_args, param_args, dtypes,
+                                 parallel=False):
+    """
+    Create a string for a function of the form::
+
+        def fused_func(n, a_x, a_y, ..., p_z, ...):
+            for i in range(n):
+                v_x = a_x[i]
+                ...
+                (v_y, ...) = calc_func_1(v_x, ..., p_z, ...)
+                v_y = np.float64(v_y)
+                ...
+                a_y[i] = v_y
+                ...
+
+    that runs a whole sequence of calc functions on one record at a time,
+    so that intermediate values stay in local variables instead of being
+    written to and read back from full-length arrays.  Each output is cast
+    to the type of its array right after it is computed, exactly as storing
+    it in the array would do, so the results are bit-identical to calling
+    the calc functions one after another.
+
+    When taxinc_to_amti is not empty the functions in it are run twice,
+    between the before and after sequences, to choose for each record
+    between the standard deduction and itemized deductions: once with the
+    standard deduction and once with itemized deductions, keeping the
+    results of whichever of the two gave the lower c05800 tax.  This gives
+    the same results as running the functions a third time with the chosen
+    deduction because, given the deductions, their outputs do not depend
+    on the values they wrote the first time.
+
+    Parameters
+    ----------
+    before: iterable of iterate_jit calc functions run first
+
+    taxinc_to_amti: iterable of iterate_jit calc functions that compute
+                    c05800 from the deductions
+
+    after: iterable of iterate_jit calc functions run last
+
+    record_args: dictionary mapping each record variable name used by the
+                 calc functions to the name of the array that holds it
+                 (names that share one array map to the same name)
+
+    param_args: iterable of the parameter names used by the calc functions
+
+    dtypes: dictionary mapping each array name in record_args to the name
+            of the numpy scalar type of that array
+
+    parallel: Bool, if True, loop over the records with prange
+
+    Returns
+    -------
+    a String representing the function
+    """
+    def cast(name, value):
+        return "np.{}({})".format(dtypes[name], value)
+
+    loaded = []
+    assigned = set()
+
+    def call(func, written=None):
+        lines = []
+        in_vals = []
+        for arg in func.in_args:
+            if arg in func.kwargs_for_func:
+                in_vals.append(str(func.kwargs_for_func[arg]))
+            elif arg in func.parameters:
+                in_vals.append("p_" + arg)
+            else:
+                name = record_args[arg]
+                if name not in assigned and name not in loaded:
+                    loaded.append(name)
+                in_vals.append("v_" + name)
+        out_names = [record_args[arg] for arg in func.out_args]
+        lines.append("{} = {}({})".format(
+            ", ".join("v_" + name for name in out_names),
+            func.__name__, ", ".join(in_vals)))
+        for name in out_names:
+            lines.append("v_{0} = {1}".format(name, cast(name, "v_" + name)))
+            assigned.add(name)
+            if written is not None and name not in written:
+                written.append(name)
+        return lines
+
+    def use(*names):
+        for name in names:
+            if name not in assigned and name not in loaded:
+                loaded.append(name)
+            assigned.add(name)
+
+    body = []
+    for func in before:
+        body.extend(call(func))
+    if taxinc_to_amti:
+        std, item, item_no_limit, tax = [record_args[arg] for arg in
+                                         ('_standard', 'c04470', 'c21060',
+                                          'c05800')]
+        use(std, item, item_no_limit)
+        # taxes with the standard deduction
+        body.append("std_ded = v_" + std)
+        body.append("item_ded = v_" + item)
+        body.append("item_ded_no_limit = v_" + item_no_limit)
+        body.append("v_{0} = {1}".format(item, cast(item, "0.")))
+        body.append("v_{0} = {1}".format(item_no_limit,
+                                         cast(item_no_limit, "0.")))
+        written = []
+        for func in taxinc_to_amti:
+            body.extend(call(func, written))
+        body.append("std_taxes = v_" + tax)
+        for name in written:
+            body.append("s_{0} = v_{0}".format(name))
+        # taxes with itemized deductions
+        body.append("v_{0} = {1}".format(std, cast(std, "0.")))
+        body.append("v_{0} = item_ded_no_limit".format(item_no_limit))
+        body.append("v_{0} = item_ded".format(item))
+        for func in taxinc_to_amti:
+            body.extend(call(func))
+        body.append("item_taxes = v_" + tax)
+        # keep the results of whichever deduction gives the lower tax
+        body.append("if item_taxes < std_taxes:")
+        body.append("    v_{0} = {1}".format(std, cast(std, "0.")))
+        body.append("    v_{0} = item_ded".format(item))
+        body.append("    v_{0} = item_ded_no_limit".format(item_no_limit))
+        body.append("else:")
+        for name in written:
+            body.append("    v_{0} = s_{0}".format(name))
+        body.append("    v_{0} = std_ded".format(std))
+        body.append("    v_{0} = {1}".format(item, cast(item, "0.")))
+        body.append("    v_{0} = {1}".format(item_no_limit,
+                                             cast(item_no_limit, "0.")))
+    for func in after:
+        body.extend(call(func))
+
+    arrays = sorted(set(record_args.values()))
+    s = StringIO()
+    s.write("def fused_func(n, {}):\n".format(
+        ", ".join(["a_" + name for name in arrays] +
+                  ["p_" + name for name in param_args])))
+    s.write("    for i in {}(n):\n".format("prange" if parallel else "range"))
+    for name in loaded:
+        s.write("        v_{0} = a_{0}[i]\n".format(name))
+    for line in body:
+        s.write("        " + line + "\n")
+    for name in arrays:
+        if name in assigned:
+            s.write("        a_{0}[i] = v_{0}\n".format(name))
+
+    return s.getvalue()
+
+
+def fused_jit(before, taxinc_to_amti=(), after=(), **kwargs):
+    """
+    Make a function fused_f(pm, pf) that has the same effect on pm and pf
+    as calling each of the given iterate_jit calc functions in turn (see
+    create_fused_function_string for the order), but that runs them all
+    in a single jitted pass over the records.  Unlike the calc functions,
+    fused_f writes its results in place and returns nothing.  Like them,
+    fused_f takes an optional threads argument; with more than one thread
+    the pass is split across that many threads.
+
+    Parameters
+    ----------
+    before, taxinc_to_amti, after: iterables of iterate_jit calc functions
+        as described in create_fused_function_string
+
+    kwargs: keyword arguments passed to numba's jit
+
+    Returns
+    -------
+    fused function
+    """
+    if KERNEL_CACHE_DIR:
+        kwargs['cache'] = True
+    funcs = list(before) + list(taxinc_to_amti) + list(after)
+    # Fused functions already compiled, keyed by their source
+    fused_fns = {}
+
+    def fused_globals():
+        # the jitted calc functions are only made when the first fused
+        # function is compiled
+        globs = dict((func.__name__, func.jitted_function())
+                     for func in funcs)
+        globs['np'] = np
+        globs['prange'] = numba.prange
+        globs['__name__'] = funcs[0].__module__
+        return globs
+
+    def fused_f(pm, pf, threads=1):
+        parallel = threads > 1
+
+        def holder(arg):
+            if hasattr(pm, arg):
+                return pm
+            elif hasattr(pf, arg):
+                return pf
+            raise ValueError("Unknown arg: " + arg)
+
+        if taxinc_to_amti:
+            # choosing between deductions replaces these arrays with
+            # float arrays in Calculator.calc_one_year
+            for arg in ('_standard', 'c04470', 'c21060'):
+                obj = holder(arg)
+                arr = getattr(obj, arg)
+                if arr.dtype != np.float64:
+                    setattr(obj, arg, arr.astype(np.float64))
+
+        record_args = {}
+        param_args = []
+        arrays = {}
+        for func in funcs:
+            for arg in func.in_args + func.out_args:
+                if arg in func.kwargs_for_func:
+                    continue
+                if arg in func.parameters and arg not in func.out_args:
+                    if arg not in param_args:
+                        param_args.append(arg)
+                elif arg not in record_args:
+                    arr = getattr(holder(arg), arg)
+                    # names that share one array share one local variable
+                    for name, other in arrays.items():
+                        if other is arr:
+                            record_args[arg] = name
+                            break
+                    else:
+                        record_args[arg] = arg
+                        arrays[arg] = arr
+        dtypes = dict((name, arr.dtype.type.__name__)
+                      for name, arr in arrays.items())
+
+        src = create_fused_function_string(before, taxinc_to_amti, after,
+                                           record_args, param_args, dtypes,
+                                           parallel=parallel)
+        fused_fn = fused_fns.get(src)
+        if fused_fn is None:
+            if KERNEL_CACHE_DIR:
+                filename = apply_function_source_file(funcs[0].__wrapped__,
+                                                      src, KERNEL_CACHE_DIR)
+            else:
+                filename = "<string>"
+            func_code = compile(src, filename, "exec")
+            fakeglobals = {}
+            eval(func_code, fused_globals(), fakeglobals)
+            if parallel:
+                fused_fn = jit(parallel=True, nogil=True,
+                               **kwargs)(fakeglobals['fused_func'])
+            else:
+                fused_fn = jit(**kwargs)(fakeglobals['fused_func'])
+            fused_fns[src] = fused_fn
+
+        dim = len(next(iter(arrays.values())))
+        args = ([dim] + [arrays[name] for name in sorted(arrays)] +
+                [getattr(holder(arg), arg) for arg in param_args])
+        if parallel:
+            call_with_threads(threads, fused_fn, *args)
+        else:
+            fused_fn(*args)
+
+    return fused_f
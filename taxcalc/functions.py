@@ -4,7 +4,6 @@ from pandas import DataFrame
 import math
 import numpy as np
 from .decorators import *
-import copy
 
 
 @iterate_jit(nopython=True)
@@ -1673,7 +1672,7 @@ def ExpandIncome(FICA_ss_trt, SS_Earnings_c, e00200, FICA_mc_trt, e02400,
 
 def BenefitSurtax(calc):
     if calc.policy.ID_BenefitSurtax_crt != 1:
-        nobenefits_calc = copy.deepcopy(calc)
+        nobenefits_calc = calc.fork()
 
         # hard code the reform
         nobenefits_calc.policy.ID_Medical_HC = \
@@ -1689,7 +1688,7 @@ def BenefitSurtax(calc):
         nobenefits_calc.policy.ID_Charity_HC = \
             int(nobenefits_calc.policy.ID_BenefitSurtax_Switch[5])
 
-        nobenefits_calc.calc_one_year()
+        nobenefits_calc.calc_one_year(outputs=['_iitax', 'c00100'])
 
         tax_diff = np.where(nobenefits_calc.records._iitax -
                             calc.records._iitax > 0,
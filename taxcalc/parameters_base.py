@@ -17,6 +17,14 @@ class ParametersBase(object):
 
     DEFAULTS_FILENAME = None
 
+    # parsed contents of the DEFAULTS_FILENAME file of each class, which is
+    # read only once in a process
+    _defaults_cache = {}
+
+    # parameter blocks of the default values expanded for given years and
+    # indexing rates, shared by all the objects created with them
+    _snapshots = {}
+
     @classmethod
     def default_data(cls, metadata=False, start_year=None):
         """
@@ -60,16 +68,68 @@ class ParametersBase(object):
         self.set_default_vals()
 
     def set_default_vals(self):
+        key = self._snapshot_key()
+        snapshot = ParametersBase._snapshots.get(key)
+        if snapshot is not None:
+            # a copy of the snapshot is all that objects created with the
+            # default values need
+            self._param_block = snapshot[0].copy()
+            self._year_names = snapshot[1]
+            self.set_year(self._start_year)
+            return
+        arrays = []
         for name, data in self._vals.items():
             cpi_inflated = data.get('cpi_inflated', False)
             values = data['value']
             index_rates = self.indexing_rates(name)
-            setattr(self, name,
-                    self.expand_array(values, inflate=cpi_inflated,
-                                      inflation_rates=index_rates,
-                                      num_years=self._num_years))
+            arrays.append((name,
+                           self.expand_array(values, inflate=cpi_inflated,
+                                             inflation_rates=index_rates,
+                                             num_years=self._num_years)))
+        # all years of all parameters are kept in one structured array
+        # with one row for each year and one field for each parameter
+        block = np.zeros(self._num_years,
+                         dtype=[(str(name), arr.dtype, arr.shape[1:])
+                                for name, arr in arrays])
+        for name, arr in arrays:
+            block[name] = arr[:self._num_years]
+        self._param_block = block
+        self._year_names = frozenset(name[1:] for name, _ in arrays)
+        if key is not None:
+            snapshot_block = block.copy()
+            snapshot_block.flags.writeable = False
+            ParametersBase._snapshots[key] = (snapshot_block, self._year_names)
         self.set_year(self._start_year)
 
+    def __getattr__(self, name):
+        """
+        Return the values of parameter name for all years when name starts
+        with an underscore, and otherwise the current year's value of
+        parameter _name, which is kept as an ordinary attribute until the
+        next call to set_year.  The values for all years are a view of the
+        parameter block, so changing them in place changes the block.
+        """
+        block = self.__dict__.get('_param_block')
+        if block is not None:
+            if name in block.dtype.fields:
+                return block[name]
+            if name in self.__dict__['_year_names']:
+                year_zero_indexed = (self.__dict__['_current_year'] -
+                                     self.__dict__['_start_year'])
+                value = block['_' + name][year_zero_indexed]
+                self.__dict__[name] = value
+                return value
+        msg = "'{}' object has no attribute '{}'"
+        raise AttributeError(msg.format(type(self).__name__, name))
+
+    @property
+    def parameter_names(self):
+        """
+        The frozenset of the names of the parameters, without their leading
+        underscores, as used for their current-year values.
+        """
+        return self._year_names
+
     @property
     def num_years(self):
         return self._num_years
@@ -138,13 +198,36 @@ class ParametersBase(object):
             msg = 'year passed to set_year() must be in [{},{}] range.'
             raise ValueError(msg.format(self.start_year, self.end_year))
         self._current_year = year
-        year_zero_indexed = year - self._start_year
-        for name in self._vals:
-            arr = getattr(self, name)
-            setattr(self, name[1:], arr[year_zero_indexed])
+        # the values of the new year are looked up by __getattr__ when they
+        # are first used, so only those of the old year that were used (or
+        # set directly) need to be forgotten
+        for name in self._year_names.intersection(self.__dict__):
+            del self.__dict__[name]
 
     # ----- begin private methods of ParametersBase class -----
 
+    def _snapshot_key(self):
+        """
+        Return the key of the expanded default values of this object in
+        _snapshots, or None when its parameter values are not the values
+        read from DEFAULTS_FILENAME.
+        """
+        defaults = ParametersBase._defaults_cache.get(type(self))
+        if defaults is None or len(defaults) != len(self._vals):
+            return None
+        cpi_flags = []
+        for name, data in self._vals.items():
+            default = defaults.get(name)
+            if default is None or data['value'] is not default['value']:
+                return None
+            cpi_flags.append((name, bool(data.get('cpi_inflated', False))))
+        rates = self.__dict__.get('_inflation_rates')
+        wage_rates = self.__dict__.get('_wage_growth_rates')
+        return (type(self), self._start_year, self._num_years,
+                tuple(rates) if rates is not None else None,
+                tuple(wage_rates) if wage_rates is not None else None,
+                tuple(sorted(cpi_flags)))
+
     @staticmethod
     def _revised_default_data(params, start_year, nyrs, ppo):
         """
@@ -210,19 +293,25 @@ class ParametersBase(object):
         if cls.DEFAULTS_FILENAME is None:
             msg = 'DEFAULTS_FILENAME must be overrriden by inheriting class'
             raise NotImplementedError(msg)
-        path = os.path.join(os.path.abspath(os.path.dirname(__file__)),
-                            cls.DEFAULTS_FILENAME)
-        if os.path.exists(path):
-            with open(path) as pfile:
-                params_dict = json.load(pfile)
-        else:
-            from pkg_resources import resource_stream, Requirement
-            path_in_egg = os.path.join('taxcalc', cls.DEFAULTS_FILENAME)
-            buf = resource_stream(Requirement.parse('taxcalc'), path_in_egg)
-            as_bytes = buf.read()
-            as_string = as_bytes.decode("utf-8")
-            params_dict = json.loads(as_string)
-        return params_dict
+        params_dict = ParametersBase._defaults_cache.get(cls)
+        if params_dict is None:
+            path = os.path.join(os.path.abspath(os.path.dirname(__file__)),
+                                cls.DEFAULTS_FILENAME)
+            if os.path.exists(path):
+                with open(path) as pfile:
+                    params_dict = json.load(pfile)
+            else:
+                from pkg_resources import resource_stream, Requirement
+                path_in_egg = os.path.join('taxcalc', cls.DEFAULTS_FILENAME)
+                buf = resource_stream(Requirement.parse('taxcalc'),
+                                      path_in_egg)
+                as_bytes = buf.read()
+                as_string = as_bytes.decode("utf-8")
+                params_dict = json.loads(as_string)
+            ParametersBase._defaults_cache[cls] = params_dict
+        # each parameter's dictionary is copied because callers change
+        # its items, but never the values lists in place
+        return dict((name, dict(data)) for name, data in params_dict.items())
 
     def _update(self, year_mods):
         """
@@ -390,17 +479,15 @@ class ParametersBase(object):
                 ans = np.zeros(num_years, dtype='f8')
                 ans[:len(x)] = x
                 if inflate:
-                    extra = []
-                    cur = x[-1]
-                    for i in range(0, num_years - len(x)):
-                        inf_idx = i + len(x) - 1
-                        cur *= (1. + inflation_rates[inf_idx])
-                        extra.append(cur)
+                    # the cumulative product starting from the last given
+                    # value multiplies in one rate at a time, in order
+                    growth = np.empty(num_years - len(x) + 1)
+                    growth[0] = x[-1]
+                    growth[1:] = 1. + np.asarray(
+                        inflation_rates[len(x) - 1:num_years - 1])
+                    ans[len(x):] = np.cumprod(growth)[1:]
                 else:
-                    extra = [float(x[-1]) for i in
-                             range(1, num_years - len(x) + 1)]
-
-                ans[len(x):] = extra
+                    ans[len(x):] = float(x[-1])
                 return ans.astype(x.dtype, casting='unsafe')
         return ParametersBase.expand_1D(np.array([x]),
                                         inflate,
@@ -417,40 +504,30 @@ class ParametersBase(object):
         """
         if isinstance(x, np.ndarray):
             # Look for -1s and create masks if present
-            last_good_row = -1
-            keep_user_data_mask = []
-            keep_calc_data_mask = []
-            has_nones = False
-            for row in x:
-                keep_user_data_mask.append([1 if i != -1 else 0 for i in row])
-                keep_calc_data_mask.append([0 if i != -1 else 1 for i in row])
-                if not np.any(row == -1):
-                    last_good_row += 1
-                else:
-                    has_nones = True
+            missing = (x == -1)
+            has_nones = missing.any()
             if x.shape[0] >= num_years and not has_nones:
                 return x
             else:
                 if has_nones:
+                    last_good_row = np.count_nonzero(~missing.any(axis=1)) - 1
                     c = x[:last_good_row + 1]
-                    keep_user_data_mask = np.array(keep_user_data_mask)
-                    keep_calc_data_mask = np.array(keep_calc_data_mask)
-
+                    keep_user_data_mask = (~missing).astype(int)
+                    keep_calc_data_mask = missing.astype(int)
                 else:
                     c = x
                 ans = np.zeros((num_years, c.shape[1]))
                 ans[:len(c), :] = c
                 if inflate:
-                    extra = []
-                    cur = c[-1]
-                    for i in range(0, num_years - len(c)):
-                        inf_idx = i + len(c) - 1
-                        cur = np.array(cur * (1. + inflation_rates[inf_idx]))
-                        extra.append(cur)
+                    # the cumulative products down the rows starting from
+                    # the last given row multiply in one rate at a time
+                    growth = np.empty((num_years - len(c) + 1, c.shape[1]))
+                    growth[0] = c[-1]
+                    growth[1:] = 1. + np.asarray(
+                        inflation_rates[len(c) - 1:num_years - 1])[:, None]
+                    ans[len(c):, :] = np.cumprod(growth, axis=0)[1:]
                 else:
-                    extra = [c[-1, :] for i in
-                             range(1, num_years - len(c) + 1)]
-                ans[len(c):, :] = extra
+                    ans[len(c):, :] = c[-1, :]
                 if has_nones:
                     # Use masks to "mask in" provided data and "mask out"
                     # data we don't need (produced in rows with a None value)
@@ -484,10 +561,7 @@ class ParametersBase(object):
             if not isinstance(val, list):
                 accum.append(val)
             else:
-                for i, v in enumerate(val):
-                    if v is None:
-                        val[i] = -1
-                accum.append(val)
+                accum.append([-1 if v is None else v for v in val])
 
         return accum
 
@@ -4,8 +4,17 @@ Tax-Calculator tax-filing-unit Records class.
 import pandas as pd
 import numpy as np
 import os
-from numba import vectorize, float64
+import re
+import copy
+import json
+import shutil
+import hashlib
+import pickle
+import tempfile
+from collections import OrderedDict, namedtuple
+from numba import jit, vectorize, float64
 from pkg_resources import resource_stream, Requirement
+from .decorators import KERNEL_CACHE_DIR
 
 
 class Records(object):
@@ -34,6 +43,12 @@ class Records(object):
         integer implies current_year is set to start_year
         default value is None
 
+    float32_amounts: boolean
+        True implies the dollar amounts read from data are stored as
+        float32 rather than float64, which halves their memory footprint
+        at the cost of rounding them to about seven significant digits
+        default value is False
+
     Raises
     ------
     ValueError:
@@ -70,6 +85,65 @@ class Records(object):
     def from_file(cls, path, **kwargs):
         return cls(path, **kwargs)
 
+    @classmethod
+    def chunks(cls, data, chunksize, **kwargs):
+        """
+        Generate Records objects that each hold the next chunksize records
+        of data, reading a CSV file chunk by chunk so that no more than one
+        chunk of it is ever in memory.
+
+        Parameters
+        ----------
+        data: string or Pandas DataFrame
+            as accepted by the Records class constructor
+
+        chunksize: integer
+            number of records in each chunk (the last chunk may be smaller
+            and the 2009 PUF aggregated record is removed from its chunk)
+
+        kwargs: keyword arguments passed on to the Records class constructor
+            each chunk gets the rows of the weights of its own records
+
+        Returns
+        -------
+        generator of class instances: Records
+
+        Notes
+        -----
+        The columns of a CSV file are read in the dtypes of CHUNK_DTYPES
+        rather than in those pandas infers from the values of each chunk,
+        so that every chunk holds every variable in the same dtype.  Dollar
+        amounts are therefore floats even when a whole-file read would make
+        them integers, which the blowup to later years does not truncate.
+        """
+        weights = Records._weights_frame(kwargs.pop('weights',
+                                                    Records.WEIGHTS_PATH))
+        if isinstance(data, pd.core.frame.DataFrame):
+            frames = (data.iloc[start:start + chunksize]
+                      for start in range(0, len(data), chunksize))
+        elif isinstance(data, str):
+            if data.endswith("gz"):
+                frames = pd.read_csv(data, compression='gzip',
+                                     dtype=Records.CHUNK_DTYPES,
+                                     chunksize=chunksize)
+            else:
+                frames = pd.read_csv(data, dtype=Records.CHUNK_DTYPES,
+                                     chunksize=chunksize)
+        else:
+            msg = ('Records.chunks data is neither a string nor '
+                   'a Pandas DataFrame')
+            raise ValueError(msg)
+        # the rows of the weights are those of the records that are kept
+        start = 0
+        for frame in frames:
+            num = int((frame.recid != 999999).sum())
+            if num > 0:
+                chunk_weights = weights.iloc[start:start + num]
+                yield cls(data=frame,
+                          weights=chunk_weights.reset_index(drop=True),
+                          **kwargs)
+            start += num
+
     # pairs of 'name of attribute', 'column name' - often the same
     # NOTE: second name in each pair is what Records.__init__() expects
     # if data parameter is a Pandas DataFrame rather than a CSV filename.
@@ -366,21 +440,102 @@ class Records(object):
                     'c07600', 'c07240', 'c62100_everyone',
                     '_surtax', '_combined', 'x04500']
 
+    # the zeroed variables are allocated only when first used
+    _ZEROED = frozenset(ZEROED_NAMES)
+
+    # compact dtypes of the categorical and count variables read from data,
+    # used whenever they hold the values exactly
+    COMPACT_DTYPES = dict([(name, np.int8) for name in (
+        'AGIR1', 'DSI', 'EFI', 'EIC', 'ELECT', 'FDED', 'FLPDMO', 'f2441',
+        'f3800', 'f6251', 'f8582', 'f8606', 'IE', 'MARS', 'MIDR', 'n20',
+        'n24', 'n25', 'PREP', 'SCHB', 'SCHCF', 'SCHE', 'TFORM', 'TXST',
+        'XFPT', 'XFST', 'XOCAH', 'XOCAWH', 'XOODEP', 'XOPAR', 'XTOT', 'age')] +
+        [('FLPDYR', np.int16), ('SOIYR', np.int16), ('RECID', np.int32)])
+
+    # dollar amounts read from data, stored as float32 if float32_amounts
+    AMOUNT_NAMES = frozenset(
+        name for name, _ in NAMES
+        if re.match(r'[a-z][0-9]{5}$', name) or name.startswith('wage_'))
+
+    # dtypes in which Records.chunks reads the columns of a CSV file;
+    # floats hold every value a column may have, including missing ones,
+    # and the categorical and count variables are then made as compact as
+    # COMPACT_DTYPES allows
+    CHUNK_DTYPES = dict((column, np.float64) for _, column in NAMES)
+
+    # blowup factor of each variable changed by the Stage 1 blowup; a third
+    # item gives the factor applied to negative values instead, where None
+    # leaves negative values unchanged (variables whose factor is always
+    # one are not listed)
+    BLOWUP_FACTORS = (
+        ('e00200', 'AWAGE'), ('e00200p', 'AWAGE'), ('e00200s', 'AWAGE'),
+        ('e00300', 'AINTS'), ('e00400', 'AINTS'), ('e00600', 'ADIVS'),
+        ('e00650', 'ADIVS'), ('e00700', 'ATXPY'), ('e00800', 'ATXPY'),
+        ('e00900', 'ASCHCI', 'ASCHCL'), ('e00900s', 'ASCHCI', 'ASCHCL'),
+        ('e00900p', 'ASCHCI', 'ASCHCL'), ('e01000', 'ACGNS', None),
+        ('e01100', 'ACGNS'), ('e01200', 'ACGNS'), ('e01400', 'ATXPY'),
+        ('e01500', 'ATXPY'), ('e01700', 'ATXPY'),
+        ('e02000', 'ASCHEI', 'ASCHEL'), ('e02100', 'ASCHF'),
+        ('e02100p', 'ASCHF'), ('e02100s', 'ASCHF'), ('e02300', 'AUCOMP'),
+        ('e02400', 'ASOCSEC'), ('e02500', 'ASOCSEC'), ('e03150', 'ATXPY'),
+        ('e03210', 'ATXPY'), ('e03220', 'ATXPY'), ('e03230', 'ATXPY'),
+        ('e03260', 'ASCHCI'), ('e03270', 'ACPIM'), ('e03240', 'AGDPN'),
+        ('e03290', 'ACPIM'), ('e03300', 'ATXPY'), ('e03400', 'ATXPY'),
+        ('e03500', 'ATXPY'), ('e07230', 'ATXPY'), ('e07240', 'ATXPY'),
+        ('e07260', 'ATXPY'), ('e07300', 'ABOOK'), ('e07400', 'ABOOK'),
+        ('p08000', 'ATXPY'), ('e09700', 'ATXPY'), ('e09800', 'ATXPY'),
+        ('e09900', 'ATXPY'), ('e10700', 'ATXPY'), ('e10900', 'ATXPY'),
+        ('e59560', 'ATXPY'), ('e59680', 'ATXPY'), ('e59700', 'ATXPY'),
+        ('e59720', 'ATXPY'), ('e11550', 'ATXPY'), ('e11070', 'ATXPY'),
+        ('e11100', 'ATXPY'), ('e11200', 'ATXPY'), ('e11300', 'ATXPY'),
+        ('e11400', 'ATXPY'), ('e11570', 'ATXPY'), ('e11580', 'ATXPY'),
+        ('e11581', 'ATXPY'), ('e11582', 'ATXPY'), ('e11583', 'ATXPY'),
+        ('e10605', 'ATXPY'), ('e17500', 'ACPIM'), ('e18400', 'ATXPY'),
+        ('e18500', 'ATXPY'), ('e19200', 'AIPD'), ('e19550', 'ATXPY'),
+        ('e19800', 'ATXPY'), ('e20100', 'ATXPY'), ('e19700', 'ATXPY'),
+        ('e20550', 'ATXPY'), ('e20600', 'ATXPY'), ('e20400', 'ATXPY'),
+        ('e20800', 'ATXPY'), ('e20500', 'ATXPY'), ('e21040', 'ATXPY'),
+        ('p22250', 'ACGNS'), ('e22320', 'ACGNS'), ('e22370', 'ACGNS'),
+        ('p23250', 'ACGNS'), ('e24515', 'ACGNS'), ('e24516', 'ACGNS'),
+        ('e24518', 'ACGNS'), ('e24535', 'ACGNS'), ('e24560', 'ACGNS'),
+        ('e24598', 'ACGNS'), ('e24615', 'ACGNS'), ('e24570', 'ACGNS'),
+        ('p25350', 'ASCHEI'), ('p25380', 'ASCHEI'), ('p25470', 'ASCHEI'),
+        ('p25700', 'ASCHEI'), ('e25820', 'ASCHEI'), ('e25850', 'ASCHEI'),
+        ('e25860', 'ASCHEI'), ('e25940', 'ASCHEI'), ('e25980', 'ASCHEI'),
+        ('e25920', 'ASCHEI'), ('e25960', 'ASCHEI'), ('e26110', 'ASCHEI'),
+        ('e26170', 'ASCHEI'), ('e26190', 'ASCHEI'), ('e26160', 'ASCHEI'),
+        ('e26180', 'ASCHEI'), ('e26270', 'ASCHEI'), ('e26100', 'ASCHEI'),
+        ('e26390', 'ASCHEI'), ('e26400', 'ASCHEI'), ('e27200', 'ASCHEI'),
+        ('e30400', 'ASCHCI'), ('e30500', 'ASCHCI'), ('e32800', 'ATXPY'),
+        ('e33000', 'ATXPY'), ('e53240', 'ATXPY'), ('e53280', 'ATXPY'),
+        ('e53410', 'ATXPY'), ('e53300', 'ATXPY'), ('e53317', 'ATXPY'),
+        ('e53458', 'ATXPY'), ('e58950', 'ATXPY'), ('e58990', 'ATXPY'),
+        ('p60100', 'ATXPY'), ('p61850', 'ATXPY'), ('e60000', 'ATXPY'),
+        ('e62100', 'ATXPY'), ('e62900', 'ATXPY'), ('e62720', 'ATXPY'),
+        ('e62730', 'ATXPY'), ('e62740', 'ATXPY'), ('p65300', 'ATXPY'),
+        ('p65400', 'ATXPY'), ('e68000', 'ATXPY'), ('e82200', 'ATXPY'),
+        ('t27800', 'ATXPY'), ('s27860', 'ATXPY'), ('p27895', 'ATXPY'),
+        ('e87530', 'ATXPY'), ('e87550', 'ATXPY'), ('e87521', 'ATXPY'),
+        ('_cmbtp_itemizer', 'ATXPY'), ('_cmbtp_standard', 'ATXPY'))
+
     def __init__(self,
                  data="puf.csv",
                  blowup_factors=BLOWUP_FACTORS_PATH,
                  weights=WEIGHTS_PATH,
                  start_year=None,
+                 float32_amounts=False,
                  **kwargs):
 
         """
         Records class constructor
         """
-        self._read_data(data)
+        # names of the arrays shared with forks of this object
+        self._shared = set()
+        self._read_data(data, float32_amounts)
         self._read_blowup(blowup_factors)
         self._read_weights(weights)
         if start_year is None:
-            self._current_year = self.FLPDYR[0]
+            self._current_year = int(self.FLPDYR[0])
         elif isinstance(start_year, int):
             self._current_year = start_year
         else:
@@ -390,11 +545,25 @@ class Records(object):
         if self._current_year == Records.PUF_YEAR:
             self._impute_variables()
 
+    def __getattr__(self, name):
+        """
+        Allocate the array of a zeroed variable the first time it is used,
+        so that variables no calc function reads or writes take no memory.
+        """
+        if name in Records._ZEROED and 'dim' in self.__dict__:
+            value = np.zeros((self.__dict__['dim'],))
+            setattr(self, name, value)
+            return value
+        msg = "'Records' object has no attribute '{}'"
+        raise AttributeError(msg.format(name))
+
     @property
     def current_year(self):
         return self._current_year
 
     def increment_year(self):
+        # blowing up the data changes most arrays in place
+        self.own()
         self._current_year += 1
         self.FLPDYR += 1
         # Implement Stage 1 Extrapolation blowup factors
@@ -402,6 +571,42 @@ class Records(object):
         # Implement Stage 2 Extrapolation reweighting.
         self.s006 = (self.WT["WT" + str(self.current_year)] / 100).values
 
+    def advance_to_year(self, year):
+        """
+        Extrapolate the data to the given year, giving the same results, up
+        to rounding, as calling increment_year once for every year up to
+        it.  The blowup factors of all those years are multiplied together
+        and each float array is blown up once by the product, which also
+        holds for the factors that depend on the sign of a value because
+        blowup factors are positive and so never change the sign of a
+        value.  Integer arrays, which each blowup truncates, are still blown
+        up one year at a time.
+
+        Parameters
+        ----------
+        year: integer
+            later than current_year
+
+        Raises
+        ------
+        ValueError:
+            if year is not later than current_year.
+
+        Returns
+        -------
+        nothing: void
+        """
+        if year <= self.current_year:
+            msg = 'year {} is not later than current_year {}'
+            raise ValueError(msg.format(year, self.current_year))
+        # blowing up the data changes most arrays in place
+        self.own()
+        self.FLPDYR += year - self._current_year
+        self._blowup(self._current_year + 1, year)
+        self._current_year = year
+        # Implement Stage 2 Extrapolation reweighting.
+        self.s006 = (self.WT["WT" + str(self.current_year)] / 100).values
+
     def extrapolate_2009_puf(self):
         year = 2009
         self.BF.AGDPN[year] = 1
@@ -425,237 +630,233 @@ class Records(object):
         self.BF.AUCOMP[year] = 1.0034
         self.BF.APOPSNR[year] = 1
         self.BF.AIPD[year] = 1
+        self.own()
         self._blowup(year)
         self.s006 = self.WT["WT" + str(year)] / 100
 
+    def tiled(self, num_copies, names=None):
+        """
+        Return a shallow copy of this Records object in which each array
+        that holds one value per record is replaced by num_copies copies of
+        that array placed one after another, so that the copy holds
+        num_copies copies of every record.  Arrays that are shared by
+        several variables of this object are shared in the copy too.
+
+        Parameters
+        ----------
+        num_copies: integer
+
+        names: None or iterable of variable names
+            if given, only the arrays of these variables are copied; the
+            other arrays that hold one value per record, such as those of
+            calculated variables, are replaced by arrays of zeros, or left
+            to be allocated when first used for zeroed variables
+            default value is None, which copies every such array
+
+        Returns
+        -------
+        class instance: Records
+        """
+        if names is not None:
+            names = set(names)
+        recs = copy.copy(self)
+        tiled_arrays = {}
+        for name, value in self.__dict__.items():
+            if (isinstance(value, np.ndarray) and value.ndim > 0 and
+                    len(value) == self.dim):
+                if names is not None and name not in names:
+                    del recs.__dict__[name]
+                    if name not in Records._ZEROED:
+                        recs.__dict__[name] = np.zeros(
+                            (self.dim * num_copies,), dtype=value.dtype)
+                    continue
+                if id(value) not in tiled_arrays:
+                    tiled_arrays[id(value)] = np.concatenate([value] *
+                                                             num_copies)
+                setattr(recs, name, tiled_arrays[id(value)])
+        recs.dim = self.dim * num_copies
+        recs._shared = set()
+        return recs
+
+    def fork(self):
+        """
+        Return a copy of this Records object that shares all its arrays
+        with this object.  An array is copied only when either object is
+        about to change it in place, which the own method arranges for the
+        changes made by the Records methods and by the Calculator class.
+        Arrays replaced rather than changed in place need no copy.
+        """
+        recs = copy.copy(self)
+        names = set(name for name, value in self.__dict__.items()
+                    if isinstance(value, np.ndarray))
+        self._shared = self._shared | names
+        recs._shared = set(names)
+        recs.BF = self.BF.copy()
+        return recs
+
+    def own(self, names=None):
+        """
+        Give this object its own copy of each of the named arrays, or of
+        all arrays if names is None, that it may share with a fork, so that
+        the array can be changed in place.  Variables that share one array
+        keep sharing one copy of it.
+        """
+        if names is None:
+            names = set(self._shared)
+        else:
+            names = self._shared & set(names)
+        if not names:
+            return
+        copies = {}
+        for name in names:
+            value = getattr(self, name)
+            if id(value) not in copies:
+                copies[id(value)] = value.copy()
+        for name in list(self._shared):
+            value = getattr(self, name)
+            if id(value) in copies:
+                setattr(self, name, copies[id(value)])
+                self._shared.discard(name)
+
+    def share(self, directory=None):
+        """
+        Write the arrays and other state of this Records object to a new
+        directory in shared memory, from which other processes can attach
+        to them with the attach method without copying or parsing them.
+
+        Parameters
+        ----------
+        directory: None or string
+            directory in which the new directory is made; None implies
+            /dev/shm where it exists, and otherwise the temporary directory
+            default value is None
+
+        Returns
+        -------
+        path of the new directory, to be passed to the attach method and,
+        when no process needs it any more, to the release method
+        """
+        if directory is None:
+            if os.path.isdir('/dev/shm'):
+                directory = '/dev/shm'
+            else:
+                directory = tempfile.gettempdir()
+        path = tempfile.mkdtemp(prefix='taxcalc-records-', dir=directory)
+        state = {}
+        filenames = {}
+        for name, value in self.__dict__.items():
+            if isinstance(value, np.ndarray):
+                # variables that share one array share one file
+                if id(value) not in filenames:
+                    filenames[id(value)] = '{}.npy'.format(len(filenames))
+                    np.save(os.path.join(path, filenames[id(value)]), value)
+                state[name] = _SharedArray(filenames[id(value)])
+            else:
+                state[name] = value
+        state['_shared'] = set()
+        with open(os.path.join(path, 'records.pkl'), 'wb') as state_file:
+            pickle.dump(state, state_file, pickle.HIGHEST_PROTOCOL)
+        return path
+
+    @classmethod
+    def attach(cls, path):
+        """
+        Return a Records object whose arrays are the arrays written to path
+        by the share method, memory-mapped copy-on-write.  Processes that
+        attach to the same path share the pages of the arrays until one of
+        them changes an array, whose changed pages then become private to
+        that process, so changes are never seen by other processes.
+        """
+        with open(os.path.join(path, 'records.pkl'), 'rb') as state_file:
+            state = pickle.load(state_file)
+        arrays = {}
+        for name, value in state.items():
+            if isinstance(value, _SharedArray):
+                if value.filename not in arrays:
+                    arrays[value.filename] = np.load(
+                        os.path.join(path, value.filename),
+                        mmap_mode='c').view(np.ndarray)
+                state[name] = arrays[value.filename]
+        recs = cls.__new__(cls)
+        recs.__dict__.update(state)
+        return recs
+
+    @staticmethod
+    def release(path):
+        """
+        Remove the directory written by the share method.  Records objects
+        already attached to it keep working, because their memory-mapped
+        files stay in existence until they are closed.
+        """
+        shutil.rmtree(path)
+
     # --- begin private methods of Records class --- #
 
-    def _blowup(self, year):
-        def times_equal(a, b):
-            try:
-                np.multiply(a, b, out=a, casting='unsafe')
-            except TypeError:
-                a = a.values
-                np.multiply(a, b, out=a, casting='unsafe')
-
-        times_equal(self.e00200, self.BF.AWAGE[year])
-        # two variables for earning split imputation
-        times_equal(self.e00200p, self.BF.AWAGE[year])
-        times_equal(self.e00200s, self.BF.AWAGE[year])
-        times_equal(self.e00300, self.BF.AINTS[year])
-        times_equal(self.e00400, self.BF.AINTS[year])
-        times_equal(self.e00600, self.BF.ADIVS[year])
-        times_equal(self.e00650, self.BF.ADIVS[year])
-        times_equal(self.e00700, self.BF.ATXPY[year])
-        times_equal(self.e00800, self.BF.ATXPY[year])
-        self.e00900[:] = np.where(self.e00900 >= 0,
-                                  self.e00900 *
-                                  self.BF.ASCHCI[year],
-                                  self.e00900 *
-                                  self.BF.ASCHCL[year])
-        self.e00900s[:] = np.where(self.e00900s >= 0,
-                                   self.e00900s *
-                                   self.BF.ASCHCI[year],
-                                   self.e00900s *
-                                   self.BF.ASCHCL[year])
-        self.e00900p[:] = np.where(self.e00900p >= 0,
-                                   self.e00900p *
-                                   self.BF.ASCHCI[year],
-                                   self.e00900p *
-                                   self.BF.ASCHCL[year])
-        self.e01000[:] = np.where(self.e01000 >= 0.,
-                                  self.e01000 * self.BF.ACGNS[year],
-                                  self.e01000)
-        times_equal(self.e01100, self.BF.ACGNS[year])
-        times_equal(self.e01200, self.BF.ACGNS[year])
-        times_equal(self.e01400, self.BF.ATXPY[year])
-        times_equal(self.e01500, self.BF.ATXPY[year])
-        times_equal(self.e01700, self.BF.ATXPY[year])
-        self.e02000[:] = np.where(self.e02000 >= 0,
-                                  self.e02000 *
-                                  self.BF.ASCHEI[year],
-                                  self.e02000 *
-                                  self.BF.ASCHEL[year])
-        times_equal(self.e02100, self.BF.ASCHF[year])
-        times_equal(self.e02100p, self.BF.ASCHF[year])
-        times_equal(self.e02100s, self.BF.ASCHF[year])
-        times_equal(self.e02300, self.BF.AUCOMP[year])
-        times_equal(self.e02400, self.BF.ASOCSEC[year])
-        # Taxable Social Security is a calculated field
-        times_equal(self.e02500, self.BF.ASOCSEC[year])
-        times_equal(self.e03150, self.BF.ATXPY[year])
-        times_equal(self.e03210, self.BF.ATXPY[year])
-        times_equal(self.e03220, self.BF.ATXPY[year])
-        times_equal(self.e03230, self.BF.ATXPY[year])
-        times_equal(self.e03260, self.BF.ASCHCI[year])
-        times_equal(self.e03270, self.BF.ACPIM[year])
-        times_equal(self.e03240, self.BF.AGDPN[year])
-        times_equal(self.e03290, self.BF.ACPIM[year])
-        times_equal(self.e03300, self.BF.ATXPY[year])
-        times_equal(self.e03400, self.BF.ATXPY[year])
-        times_equal(self.e03500, self.BF.ATXPY[year])
-        # Adjusted Gross Income is a calculated field
-        times_equal(self.e00100, 1.)
-        times_equal(self.p04470, 1.)
-        times_equal(self.e04250, 1.)
-        times_equal(self.e04600, 1.)
-        times_equal(self.e04800, 1.)
-        times_equal(self.e05100, 1.)
-        times_equal(self.e05200, 1.)
-        times_equal(self.e05800, 1.)
-        times_equal(self.e06000, 1.)
-        times_equal(self.e06200, 1.)
-        times_equal(self.e06300, 1.)
-        times_equal(self.e09600, 1.)
-        times_equal(self.e07180, 1.)
-        times_equal(self.e07200, 1.)
-        times_equal(self.e07220, 1.)
-        times_equal(self.e07230, self.BF.ATXPY[year])
-        times_equal(self.e07240, self.BF.ATXPY[year])
-        times_equal(self.e07260, self.BF.ATXPY[year])
-        times_equal(self.e07300, self.BF.ABOOK[year])
-        times_equal(self.e07400, self.BF.ABOOK[year])
-        times_equal(self.e07600, 1.)
-        times_equal(self.p08000, self.BF.ATXPY[year])
-        times_equal(self.e07150, 1.)
-        times_equal(self.e06500, 1.)
-        times_equal(self.e08800, 1.)
-        times_equal(self.e09400, 1.)
-        times_equal(self.e09700, self.BF.ATXPY[year])
-        times_equal(self.e09800, self.BF.ATXPY[year])
-        times_equal(self.e09900, self.BF.ATXPY[year])
-        times_equal(self.e10300, 1.)
-        times_equal(self.e10700, self.BF.ATXPY[year])
-        times_equal(self.e10900, self.BF.ATXPY[year])
-        times_equal(self.e59560, self.BF.ATXPY[year])
-        times_equal(self.e59680, self.BF.ATXPY[year])
-        times_equal(self.e59700, self.BF.ATXPY[year])
-        times_equal(self.e59720, self.BF.ATXPY[year])
-        times_equal(self.e11550, self.BF.ATXPY[year])
-        times_equal(self.e11070, self.BF.ATXPY[year])
-        times_equal(self.e11100, self.BF.ATXPY[year])
-        times_equal(self.e11200, self.BF.ATXPY[year])
-        times_equal(self.e11300, self.BF.ATXPY[year])
-        times_equal(self.e11400, self.BF.ATXPY[year])
-        times_equal(self.e11570, self.BF.ATXPY[year])
-        times_equal(self.e11580, self.BF.ATXPY[year])
-        times_equal(self.e11581, self.BF.ATXPY[year])
-        times_equal(self.e11582, self.BF.ATXPY[year])
-        times_equal(self.e11583, self.BF.ATXPY[year])
-        times_equal(self.e10605, self.BF.ATXPY[year])
-        times_equal(self.e11900, 1.)
-        times_equal(self.e12000, 1.)
-        times_equal(self.e12200, 1.)
-        """  ITEMIZED DEDUCTIONS """
-        times_equal(self.e17500, self.BF.ACPIM[year])
-        times_equal(self.e18400, self.BF.ATXPY[year])
-        times_equal(self.e18500, self.BF.ATXPY[year])
-        times_equal(self.e19200, self.BF.AIPD[year])
-        times_equal(self.e19550, self.BF.ATXPY[year])
-        times_equal(self.e19800, self.BF.ATXPY[year])
-        times_equal(self.e20100, self.BF.ATXPY[year])
-        times_equal(self.e19700, self.BF.ATXPY[year])
-        times_equal(self.e20550, self.BF.ATXPY[year])
-        times_equal(self.e20600, self.BF.ATXPY[year])
-        times_equal(self.e20400, self.BF.ATXPY[year])
-        times_equal(self.e20800, self.BF.ATXPY[year])
-        times_equal(self.e20500, self.BF.ATXPY[year])
-        times_equal(self.e21040, self.BF.ATXPY[year])
-        """  CAPITAL GAINS   """
-        times_equal(self.p22250, self.BF.ACGNS[year])
-        times_equal(self.e22320, self.BF.ACGNS[year])
-        times_equal(self.e22370, self.BF.ACGNS[year])
-        times_equal(self.p23250, self.BF.ACGNS[year])
-        times_equal(self.e24515, self.BF.ACGNS[year])
-        times_equal(self.e24516, self.BF.ACGNS[year])
-        times_equal(self.e24518, self.BF.ACGNS[year])
-        times_equal(self.e24535, self.BF.ACGNS[year])
-        times_equal(self.e24560, self.BF.ACGNS[year])
-        times_equal(self.e24598, self.BF.ACGNS[year])
-        times_equal(self.e24615, self.BF.ACGNS[year])
-        times_equal(self.e24570, self.BF.ACGNS[year])
-        """  SCHEDULE E  """
-        times_equal(self.p25350, self.BF.ASCHEI[year])
-        times_equal(self.p25380, self.BF.ASCHEI[year])
-        times_equal(self.p25470, self.BF.ASCHEI[year])
-        times_equal(self.p25700, self.BF.ASCHEI[year])
-        times_equal(self.e25820, self.BF.ASCHEI[year])
-        times_equal(self.e25850, self.BF.ASCHEI[year])
-        times_equal(self.e25860, self.BF.ASCHEI[year])
-        times_equal(self.e25940, self.BF.ASCHEI[year])
-        times_equal(self.e25980, self.BF.ASCHEI[year])
-        times_equal(self.e25920, self.BF.ASCHEI[year])
-        times_equal(self.e25960, self.BF.ASCHEI[year])
-        times_equal(self.e26110, self.BF.ASCHEI[year])
-        times_equal(self.e26170, self.BF.ASCHEI[year])
-        times_equal(self.e26190, self.BF.ASCHEI[year])
-        times_equal(self.e26160, self.BF.ASCHEI[year])
-        times_equal(self.e26180, self.BF.ASCHEI[year])
-        times_equal(self.e26270, self.BF.ASCHEI[year])
-        times_equal(self.e26100, self.BF.ASCHEI[year])
-        times_equal(self.e26390, self.BF.ASCHEI[year])
-        times_equal(self.e26400, self.BF.ASCHEI[year])
-        times_equal(self.e27200, self.BF.ASCHEI[year])
-        """  MISCELLANOUS SCHEDULES"""
-        times_equal(self.e30400, self.BF.ASCHCI[year])
-        times_equal(self.e30500, self.BF.ASCHCI[year])
-        times_equal(self.e32800, self.BF.ATXPY[year])
-        times_equal(self.e33000, self.BF.ATXPY[year])
-        times_equal(self.e53240, self.BF.ATXPY[year])
-        times_equal(self.e53280, self.BF.ATXPY[year])
-        times_equal(self.e53410, self.BF.ATXPY[year])
-        times_equal(self.e53300, self.BF.ATXPY[year])
-        times_equal(self.e53317, self.BF.ATXPY[year])
-        times_equal(self.e53458, self.BF.ATXPY[year])
-        times_equal(self.e58950, self.BF.ATXPY[year])
-        times_equal(self.e58990, self.BF.ATXPY[year])
-        times_equal(self.p60100, self.BF.ATXPY[year])
-        times_equal(self.p61850, self.BF.ATXPY[year])
-        times_equal(self.e60000, self.BF.ATXPY[year])
-        times_equal(self.e62100, self.BF.ATXPY[year])
-        times_equal(self.e62900, self.BF.ATXPY[year])
-        times_equal(self.e62720, self.BF.ATXPY[year])
-        times_equal(self.e62730, self.BF.ATXPY[year])
-        times_equal(self.e62740, self.BF.ATXPY[year])
-        times_equal(self.p65300, self.BF.ATXPY[year])
-        times_equal(self.p65400, self.BF.ATXPY[year])
-        times_equal(self.e68000, self.BF.ATXPY[year])
-        times_equal(self.e82200, self.BF.ATXPY[year])
-        times_equal(self.t27800, self.BF.ATXPY[year])
-        times_equal(self.s27860, self.BF.ATXPY[year])
-        times_equal(self.p27895, self.BF.ATXPY[year])
-        times_equal(self.e87530, self.BF.ATXPY[year])
-        times_equal(self.e87550, self.BF.ATXPY[year])
-        times_equal(self.e87521, self.BF.ATXPY[year])
-        times_equal(self.RECID, 1.)
-        times_equal(self.s006, 1.)
-        times_equal(self.s008, 1.)
-        times_equal(self.s009, 1.)
-        times_equal(self.WSAMP, 1.)
-        times_equal(self.TXRT, 1.)
-        times_equal(self._cmbtp_itemizer, self.BF.ATXPY[year])
-        times_equal(self._cmbtp_standard, self.BF.ATXPY[year])
-
-    def _read_data(self, data):
+    def _blowup(self, year, last_year=None):
+        # the blowup factors of every year from year through last_year
+        if last_year is None:
+            last_year = year
+        yearly_factors = self.BF.loc[year:last_year]
+        factors = dict(yearly_factors.prod(skipna=False))
+        scaled = set()
+        for item in Records.BLOWUP_FACTORS:
+            values = getattr(self, item[0])
+            # variables that share one array are blown up only once
+            if id(values) in scaled:
+                continue
+            scaled.add(id(values))
+            if values.dtype.kind == 'f':
+                blowup_in_place(values, *Records._factor_pair(item, factors))
+            else:
+                # integer values are truncated by every blowup, so they are
+                # blown up one year at a time as increment_year does
+                for _, year_factors in yearly_factors.iterrows():
+                    blowup_in_place(values,
+                                    *Records._factor_pair(item, year_factors))
+
+    @staticmethod
+    def _factor_pair(item, factors):
+        """
+        Return the factors by which the BLOWUP_FACTORS item blows up the
+        non-negative and the negative values, given the value of each
+        blowup factor.
+        """
+        factor = factors[item[1]]
+        if len(item) == 2:
+            return factor, factor
+        elif item[2] is None:
+            return factor, 1.
+        return factor, factors[item[2]]
+
+    def _read_data(self, data, float32_amounts=False):
         if isinstance(data, pd.core.frame.DataFrame):
-            tax_dta = data
+            tax_dta = dict((name, data[name].values) for name in data.columns)
         elif isinstance(data, str):
+            # the aggregated record is dropped when the file is parsed, so
+            # that cached columns are used memory-mapped
             if data.endswith("gz"):
-                tax_dta = pd.read_csv(data, compression='gzip')
+                tax_dta, _ = cached_csv_columns(data,
+                                                drop_rows=('recid', 999999),
+                                                compression='gzip')
             else:
-                tax_dta = pd.read_csv(data)
+                tax_dta, _ = cached_csv_columns(data,
+                                                drop_rows=('recid', 999999))
         else:
             msg = ('Records.constructor data is neither a string nor '
                    'a Pandas DataFrame')
             raise ValueError(msg)
         # remove the aggregated record from 2009 PUF
-        tax_dta = tax_dta[tax_dta.recid != 999999]
-        self.dim = len(tax_dta)
+        keep = tax_dta['recid'] != 999999
+        self.dim = int(keep.sum())
+        if self.dim == len(keep) and isinstance(data, str):
+            # keep the cached columns memory-mapped rather than copying them
+            keep = slice(None)
         # create variables in NAMES list
         for attrname, varname in Records.NAMES:
-            setattr(self, attrname, tax_dta[varname].values)
-        for name in Records.ZEROED_NAMES:
-            setattr(self, name, np.zeros((self.dim,)))
+            values = tax_dta[varname][keep]
+            if float32_amounts and attrname in Records.AMOUNT_NAMES:
+                values = values.astype(np.float32)
+            setattr(self, attrname, Records._compact(attrname, values))
         self._num = np.ones((self.dim,))
         # specify eNNNNN aliases for several pNNNNN and sNNNNN variables
         self.e22250 = self.p22250
@@ -666,9 +867,31 @@ class Records(object):
         self.e60100 = self.p60100
         self.e27860 = self.s27860
         # specify SOIYR
-        self.SOIYR = np.repeat(Records.PUF_YEAR, self.dim)
+        self.SOIYR = Records._compact('SOIYR',
+                                      np.repeat(Records.PUF_YEAR, self.dim))
+
+    @staticmethod
+    def _compact(name, values):
+        """
+        Return values in the compact dtype of the named variable when there
+        is one and it holds every value exactly, and otherwise unchanged.
+        """
+        dtype = Records.COMPACT_DTYPES.get(name)
+        if dtype is None or values.dtype == dtype:
+            return values
+        if values.dtype.kind == 'f' and not np.isfinite(values).all():
+            # missing values cannot be held in an integer dtype
+            return values
+        compact = values.astype(dtype)
+        if np.array_equal(compact, values):
+            return compact
+        return values
 
     def _read_weights(self, weights):
+        setattr(self, 'WT', Records._weights_frame(weights))
+
+    @staticmethod
+    def _weights_frame(weights):
         if isinstance(weights, pd.core.frame.DataFrame):
             WT = weights
         elif isinstance(weights, str):
@@ -676,10 +899,12 @@ class Records(object):
                 if not os.path.exists(weights):
                     # grab weights out of EGG distribution
                     path_in_egg = os.path.join("taxcalc",
-                                               self.WEIGHTS_FILENAME)
+                                               Records.WEIGHTS_FILENAME)
                     weights = resource_stream(Requirement.parse("taxcalc"),
                                               path_in_egg)
-                WT = pd.read_csv(weights)
+                    WT = pd.read_csv(weights)
+                else:
+                    WT = pd.DataFrame(cached_csv_columns(weights)[0])
             except IOError:
                 msg = 'could not find weights file'
                 ValueError(msg)
@@ -687,7 +912,7 @@ class Records(object):
             msg = ('Records.constructor blowup_factors is neither a string '
                    'nore a Pandas DataFrame')
             raise ValueError(msg)
-        setattr(self, 'WT', WT)
+        return WT
 
     def _read_blowup(self, blowup_factors):
         if isinstance(blowup_factors, pd.core.frame.DataFrame):
@@ -700,7 +925,12 @@ class Records(object):
                                                self.BLOWUP_FACTORS_FILENAME)
                     blowup_factors = resource_stream(
                         Requirement.parse("taxcalc"), path_in_egg)
-                BF = pd.read_csv(blowup_factors, index_col='YEAR')
+                    BF = pd.read_csv(blowup_factors, index_col='YEAR')
+                else:
+                    columns, index = cached_csv_columns(blowup_factors,
+                                                        index_col='YEAR')
+                    BF = pd.DataFrame(columns,
+                                      index=pd.Index(index, name='YEAR'))
             except IOError:
                 msg = 'could not find blowup_factors file'
                 ValueError(msg)
@@ -791,3 +1021,157 @@ def imputed_cmbtp_itemizer(e17500, e00100, e18400,
     state_adjustment = max(0, e18400)
     return (e62100 - medical_adjustment + e00700 + e04470 + e21040 -
             state_adjustment - e00100 - e18500 - e20800)
+
+
+# placeholder for an array in the state written by Records.share
+_SharedArray = namedtuple('_SharedArray', ['filename'])
+
+
+# version of the layout of the cached columns; changing it invalidates
+# every cache written by earlier versions
+DATA_CACHE_FORMAT = 1
+
+
+def cached_csv_columns(path, cache_dir=None, drop_rows=None, **kwargs):
+    """
+    Read the CSV file at path into separate column arrays, using a columnar
+    binary cache of the parsed file, when caching is enabled, so that the
+    file is parsed only once.
+
+    Caching is enabled by passing cache_dir or by setting the
+    TAXCALC_CACHE_DIR environment variable; otherwise the file is parsed
+    every time and nothing is written.  The cache holds one .npy file for
+    each column in a directory whose name includes a hash of the contents
+    of the CSV file and of kwargs, so a changed file is parsed again.
+    Cached columns are memory-mapped copy-on-write: they are read from
+    disk as they are used and changing them in place never changes the
+    cache.  When the cache cannot be written, for example because its
+    directory is read-only, the parsed file is used without caching it.
+
+    Parameters
+    ----------
+    path: string
+        name of the CSV file, which may be gzip compressed
+
+    cache_dir: None or string
+        directory in which the cache is kept; None implies the data
+        subdirectory of the TAXCALC_CACHE_DIR directory when that
+        environment variable is set, and otherwise no cache
+
+    drop_rows: None or (column name, value) pair
+        rows in which the named column holds the value are dropped before
+        the columns are cached, so that the cached columns never need to
+        be copied to drop them
+
+    kwargs: keyword arguments passed on to pandas.read_csv
+
+    Returns
+    -------
+    columns: OrderedDict mapping each column name to its array
+
+    index: array holding the index of the data, or None when the data
+        have the default index
+    """
+    if cache_dir is None and KERNEL_CACHE_DIR:
+        cache_dir = os.path.join(KERNEL_CACHE_DIR, 'data')
+    if cache_dir is not None:
+        hasher = hashlib.sha1(str(DATA_CACHE_FORMAT).encode('utf-8'))
+        hasher.update(repr(sorted(kwargs.items())).encode('utf-8'))
+        if drop_rows is not None:
+            hasher.update(repr(tuple(drop_rows)).encode('utf-8'))
+        with open(path, 'rb') as csv_file:
+            for chunk in iter(lambda: csv_file.read(1 << 20), b''):
+                hasher.update(chunk)
+        cache_path = os.path.join(cache_dir, '{}-{}'.format(
+            os.path.basename(path), hasher.hexdigest()))
+        if os.path.exists(os.path.join(cache_path, 'columns.json')):
+            return _read_data_cache(cache_path)
+    frame = pd.read_csv(path, **kwargs)
+    if drop_rows is not None:
+        dropped = frame[drop_rows[0]] == drop_rows[1]
+        if dropped.any():
+            default_index = isinstance(frame.index, pd.RangeIndex)
+            frame = frame[~dropped]
+            if default_index:
+                frame = frame.reset_index(drop=True)
+    columns = OrderedDict((name, frame[name].values)
+                          for name in frame.columns)
+    if isinstance(frame.index, pd.RangeIndex):
+        index = None
+    else:
+        index = frame.index.values
+    if cache_dir is None:
+        return columns, index
+    try:
+        _write_data_cache(columns, index, cache_path)
+    except (IOError, OSError):
+        return columns, index
+    if not os.path.exists(os.path.join(cache_path, 'columns.json')):
+        return columns, index
+    # use the memory-mapped cache, whose pages processes can share, rather
+    # than the parsed file
+    return _read_data_cache(cache_path)
+
+
+def _read_data_cache(cache_path):
+    """
+    Read the cache written by _write_data_cache from the cache_path
+    directory, memory-mapping each column copy-on-write.
+    """
+    with open(os.path.join(cache_path, 'columns.json')) as layout_file:
+        layout = json.load(layout_file)
+
+    def load(filename):
+        return np.load(os.path.join(cache_path, filename),
+                       mmap_mode='c').view(np.ndarray)
+
+    columns = OrderedDict((name, load(filename))
+                          for name, filename in layout['columns'])
+    index = None if layout['index'] is None else load(layout['index'])
+    return columns, index
+
+
+def _write_data_cache(columns, index, cache_path):
+    """
+    Write the cache read by cached_csv_columns to the cache_path directory.
+    Columns of object dtype, which cannot be memory-mapped, are not cached.
+    """
+    arrays = list(columns.values())
+    if index is not None:
+        arrays.append(index)
+    if any(array.dtype.hasobject for array in arrays):
+        return
+    cache_dir = os.path.dirname(cache_path)
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    # write into a temporary directory first so that concurrent processes
+    # never see a partially written cache
+    tmp_path = tempfile.mkdtemp(dir=cache_dir)
+    try:
+        layout = {'columns': [], 'index': None}
+        for num, (name, array) in enumerate(columns.items()):
+            filename = '{}.npy'.format(num)
+            np.save(os.path.join(tmp_path, filename), array)
+            layout['columns'].append((name, filename))
+        if index is not None:
+            np.save(os.path.join(tmp_path, 'index.npy'), index)
+            layout['index'] = 'index.npy'
+        with open(os.path.join(tmp_path, 'columns.json'), 'w') as lfile:
+            json.dump(layout, lfile)
+        os.rename(tmp_path, cache_path)
+    finally:
+        if os.path.isdir(tmp_path):
+            shutil.rmtree(tmp_path)
+
+
+@jit(nopython=True, nogil=True, cache=bool(KERNEL_CACHE_DIR))
+def blowup_in_place(values, factor, negative_factor):
+    """
+    Multiply the non-negative elements of the array values by factor and
+    the negative ones by negative_factor, in place and in one pass.
+    """
+    for i in range(values.shape[0]):
+        if values[i] >= 0.:
+            values[i] = values[i] * factor
+        else:
+            values[i] = values[i] * negative_factor
@@ -0,0 +1,20 @@
+import numpy as np
+from numpy.testing import assert_array_equal
+import pytest
+
+
+def _assert_records_equal(records1, records2):
+    """
+    Assert that every array variable of records1 has the same dtype and the
+    same values in records2.
+    """
+    for name, arr1 in records1.__dict__.items():
+        if isinstance(arr1, np.ndarray):
+            arr2 = getattr(records2, name)
+            assert arr1.dtype == arr2.dtype, name
+            assert_array_equal(arr1, arr2)
+
+
+@pytest.fixture
+def assert_records_equal():
+    return _assert_records_equal
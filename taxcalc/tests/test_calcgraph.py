@@ -0,0 +1,114 @@
+import os
+import sys
+cur_path = os.path.abspath(os.path.dirname(__file__))
+sys.path.append(os.path.join(cur_path, "../../"))
+sys.path.append(os.path.join(cur_path, "../"))
+import numpy as np
+import pytest
+from taxcalc import *
+from taxcalc.calculate import (DEDUCTION_GRAPH, CREDIT_GRAPH,
+                               TAXINC_TO_AMTI_GRAPH)
+
+
+@iterate_jit(nopython=True)
+def first_calc(x):
+    a = x + 1.
+    return a
+
+
+@iterate_jit(nopython=True)
+def second_calc(x):
+    b = x * 2.
+    return b
+
+
+@iterate_jit(nopython=True)
+def third_calc(a, b):
+    c = a + b
+    return c
+
+
+@iterate_jit(nopython=True)
+def fourth_calc(c):
+    x = c
+    return x
+
+
+class Foo(object):
+    pass
+
+
+def test_dependencies():
+    graph = CalcGraph([first_calc, second_calc, third_calc, fourth_calc])
+    assert graph.reads(third_calc) == set(['a', 'b'])
+    assert graph.writes(third_calc) == set(['c'])
+    assert graph.dependencies(first_calc) == []
+    assert graph.dependencies(third_calc) == [first_calc, second_calc]
+    # fourth_calc overwrites x, which first_calc and second_calc read
+    assert graph.dependencies(fourth_calc) == [first_calc, second_calc,
+                                               third_calc]
+    assert graph.ancestors(third_calc) == [first_calc, second_calc]
+    assert graph.levels == [[first_calc, second_calc], [third_calc],
+                            [fourth_calc]]
+
+
+def test_subgraph():
+    graph = CalcGraph([first_calc, second_calc, third_calc, fourth_calc])
+    assert graph.subgraph(['a']).funcs == (first_calc,)
+    assert graph.subgraph(['c']).funcs == (first_calc, second_calc,
+                                           third_calc)
+    assert graph.subgraph(['c']).inputs == set(['x', 'a', 'b'])
+    assert graph.subgraph(['y']).funcs == ()
+
+
+def test_initial_inputs():
+    graph = CalcGraph([first_calc, second_calc, third_calc, fourth_calc])
+    assert graph.initial_inputs == set(['x'])
+    graph = CalcGraph([third_calc, first_calc])
+    assert graph.initial_inputs == set(['a', 'b', 'x'])
+
+
+@iterate_jit(nopython=True)
+def param_calc(a, II_em):
+    d = a * II_em
+    return d
+
+
+def test_affected_subgraph():
+    graph = CalcGraph([first_calc, second_calc, param_calc, third_calc])
+    assert graph.parameters(param_calc) == set(['II_em'])
+    assert graph.affected_subgraph(['II_em']).funcs == (first_calc,
+                                                        param_calc)
+    assert graph.affected_subgraph([], [second_calc]).funcs == (
+        first_calc, second_calc, third_calc)
+    assert graph.affected_subgraph(['II_rt1']).funcs == ()
+
+
+def test_run_with_workers():
+    funcs = [first_calc, second_calc, third_calc, fourth_calc]
+    results = []
+    for workers in [1, 2]:
+        pm = Foo()
+        pf = Foo()
+        pf.x = np.arange(5.)
+        for name in ['a', 'b', 'c']:
+            setattr(pf, name, np.zeros((5,)))
+        CalcGraph(funcs).run(pm, pf, workers=workers)
+        results.append(pf.x)
+    assert np.array_equal(results[0], np.arange(5.) * 3 + 1)
+    assert np.array_equal(results[0], results[1])
+
+
+def test_raises_on_bad_func():
+    with pytest.raises(ValueError):
+        CalcGraph([first_calc, F5405])
+    with pytest.raises(ValueError):
+        CalcGraph([first_calc]).dependencies(second_calc)
+
+
+def test_calculate_graphs():
+    assert DEDUCTION_GRAPH.dependencies(FilingStatus) == []
+    assert AmOppCr in CREDIT_GRAPH.levels[0]
+    assert F2441 in CREDIT_GRAPH.levels[0]
+    assert DepCareBen not in CREDIT_GRAPH.levels[0]
+    assert TAXINC_TO_AMTI_GRAPH.ancestors(AMTI)[0] == TaxInc
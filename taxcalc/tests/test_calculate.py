@@ -1,6 +1,7 @@
 import os
 import sys
 import json
+import copy
 CUR_PATH = os.path.abspath(os.path.dirname(__file__))
 sys.path.append(os.path.join(CUR_PATH, "../../"))
 import numpy as np
@@ -8,7 +9,8 @@ from numpy.testing import assert_array_equal
 import pandas as pd
 import tempfile
 import pytest
-from taxcalc import Policy, Records, Calculator, Growth
+from taxcalc import Policy, Records, Calculator, Growth, precompile
+from taxcalc import calc_all_chunks
 from taxcalc import create_distribution_table, create_difference_table
 
 
@@ -83,7 +85,6 @@ def test_make_Calculator():
 
 
 def test_make_Calculator_deepcopy():
-    import copy
     parm = Policy()
     recs = Records(data=TAX_DTA, weights=WEIGHTS, start_year=2009)
     calc1 = Calculator(policy=parm, records=recs)
@@ -91,6 +92,265 @@ def test_make_Calculator_deepcopy():
     assert isinstance(calc2, Calculator)
 
 
+def test_precompile_requires_kernel_cache():
+    with pytest.raises(ValueError):
+        precompile(data=TAX_DTA, weights=WEIGHTS, start_year=2009)
+
+
+def test_make_Calculator_raises_on_unknown_engine():
+    recs = Records(data=TAX_DTA, weights=WEIGHTS, start_year=2009)
+    with pytest.raises(ValueError):
+        Calculator(policy=Policy(), records=recs, engine='unknown')
+
+
+def test_fused_engine_matches_standard_engine(assert_records_equal):
+    recs = Records(data=TAX_DTA, weights=WEIGHTS, start_year=2009)
+    calc1 = Calculator(policy=Policy(), records=recs)
+    calc2 = copy.deepcopy(calc1)
+    calc2.engine = 'fused'
+    calc1.calc_all()
+    calc2.calc_all()
+    assert_records_equal(calc1.records, calc2.records)
+
+
+def test_deduction_choice_matches_three_passes(assert_records_equal):
+    from taxcalc.calculate import DEDUCTION_GRAPH, CREDIT_GRAPH
+    recs = Records(data=TAX_DTA, weights=WEIGHTS, start_year=2009)
+    calc1 = Calculator(policy=Policy(), records=recs)
+    calc2 = copy.deepcopy(calc1)
+    calc1.calc_one_year()
+    # choose between the deductions by running TaxInc_to_AMTI three times
+    calc2.run_graph(DEDUCTION_GRAPH)
+    rec = calc2.records
+    std = copy.deepcopy(rec._standard)
+    item = copy.deepcopy(rec.c04470)
+    item_no_limit = copy.deepcopy(rec.c21060)
+    rec.c04470 = np.zeros(rec.dim)
+    rec.c21060 = np.zeros(rec.dim)
+    calc2.TaxInc_to_AMTI()
+    std_taxes = copy.deepcopy(rec.c05800)
+    rec._standard = np.zeros(rec.dim)
+    rec.c21060 = item_no_limit
+    rec.c04470 = item
+    calc2.TaxInc_to_AMTI()
+    item_taxes = copy.deepcopy(rec.c05800)
+    rec._standard = np.where(item_taxes < std_taxes, 0, std)
+    rec.c04470 = np.where(item_taxes < std_taxes, item, 0)
+    rec.c21060 = np.where(item_taxes < std_taxes, item_no_limit, 0)
+    calc2.TaxInc_to_AMTI()
+    calc2.run_graph(CREDIT_GRAPH)
+    assert_records_equal(calc1.records, calc2.records)
+
+
+def test_threads_match_serial_calculation(assert_records_equal):
+    recs = Records(data=TAX_DTA, weights=WEIGHTS, start_year=2009)
+    calc1 = Calculator(policy=Policy(), records=recs)
+    calc2 = copy.deepcopy(calc1)
+    calc2.threads = 2
+    calc1.calc_all()
+    calc2.calc_all()
+    assert_records_equal(calc1.records, calc2.records)
+
+
+def test_workers_match_serial_calculation(assert_records_equal):
+    recs = Records(data=TAX_DTA, weights=WEIGHTS, start_year=2009)
+    calc1 = Calculator(policy=Policy(), records=recs)
+    calc2 = copy.deepcopy(calc1)
+    calc2.workers = 4
+    calc1.calc_all()
+    calc2.calc_all()
+    assert_records_equal(calc1.records, calc2.records)
+
+
+@pytest.mark.parametrize("outputs", [
+    ['_iitax', '_fica', 'c00100'],
+    ['c00100'],
+    ['c05800'],
+    ['c62100', '_expanded_income'],
+])
+def test_calc_all_outputs_match_full_calculation(outputs):
+    policy = Policy()
+    policy.implement_reform({2013: {'_ID_BenefitSurtax_crt': [0.02]}})
+    recs = Records(data=TAX_DTA, weights=WEIGHTS, start_year=2009)
+    calc1 = Calculator(policy=policy, records=recs)
+    calc2 = copy.deepcopy(calc1)
+    calc1.calc_all()
+    calc2.calc_all(outputs=outputs)
+    for name in outputs:
+        assert_array_equal(getattr(calc1.records, name),
+                           getattr(calc2.records, name))
+
+
+def test_calc_all_raises_on_bad_outputs():
+    recs = Records(data=TAX_DTA, weights=WEIGHTS, start_year=2009)
+    calc = Calculator(policy=Policy(), records=recs)
+    with pytest.raises(ValueError):
+        calc.calc_all(outputs=['no_such_variable'])
+
+
+@pytest.mark.parametrize("reform", [
+    {2013: {'_CTC_c': [500]}},
+    {2013: {'_II_rt7': [0.45]}},
+    {2013: {'_STD': [[6000, 12000, 6000, 9000, 12000, 6000, 1000]]}},
+    {2013: {'_ID_BenefitSurtax_crt': [0.02]}},
+])
+def test_recalc_all_matches_calc_all(reform, assert_records_equal):
+    recs = Records(data=TAX_DTA, weights=WEIGHTS, start_year=2009)
+    calc1 = Calculator(policy=Policy(), records=recs)
+    calc1.calc_all()
+    calc2 = copy.deepcopy(calc1)
+    calc1.policy.implement_reform(reform)
+    calc1.calc_all()
+    calc2.policy.implement_reform(reform)
+    calc2.recalc_all()
+    assert_records_equal(calc1.records, calc2.records)
+
+
+def test_fork_matches_deepcopy(assert_records_equal):
+    policy = Policy()
+    policy.implement_reform({2013: {'_ID_BenefitSurtax_crt': [0.02]}})
+    recs = Records(data=TAX_DTA, weights=WEIGHTS, start_year=2009)
+    calc = Calculator(policy=policy, records=recs)
+    calc.calc_all()
+    iitax = calc.records._iitax.copy()
+    calc1 = copy.deepcopy(calc)
+    calc2 = calc.fork()
+    for c in [calc1, calc2]:
+        c.policy.implement_reform({2013: {'_II_rt7': [0.45]}})
+        c.calc_all()
+        c.increment_year()
+        c.calc_all()
+    assert_records_equal(calc1.records, calc2.records)
+    assert_array_equal(calc.records._iitax, iitax)
+    assert calc.current_year == 2013
+
+
+def test_calc_reforms_matches_separate_calcs():
+    reforms = [{2013: {'_II_rt7': [0.45]}},
+               {2013: {'_CTC_c': [2000]}},
+               {2013: {'_ID_BenefitSurtax_crt': [0.02]}}]
+    recs = Records(data=TAX_DTA, weights=WEIGHTS, start_year=2009)
+    calc = Calculator(policy=Policy(), records=recs)
+    calc.calc_all()
+    iitax = calc.records._iitax.copy()
+    results = calc.calc_reforms(reforms)
+    for row, reform in enumerate(reforms):
+        policy = Policy()
+        policy.implement_reform(reform)
+        recs = Records(data=TAX_DTA, weights=WEIGHTS, start_year=2009)
+        calc1 = Calculator(policy=policy, records=recs)
+        calc1.calc_all()
+        for name in ['_iitax', '_fica', '_combined']:
+            assert_array_equal(results[name][row],
+                               getattr(calc1.records, name))
+    assert_array_equal(calc.records._iitax, iitax)
+
+
+@pytest.mark.parametrize("growth_dict", [
+    None,
+    {2015: {'_factor_adjustment': [0.01]}},
+    {2015: {'_factor_target': [0.04]}},
+])
+def test_advance_to_year_matches_increment_year(growth_dict):
+    calcs = []
+    for _ in range(2):
+        growth = Growth()
+        if growth_dict:
+            growth.update_economic_growth(growth_dict)
+        recs = Records(data=TAX_DTA, weights=WEIGHTS, start_year=2009)
+        calcs.append(Calculator(policy=Policy(), records=recs,
+                                growth=growth))
+    calc1, calc2 = calcs
+    while calc1.current_year < 2018:
+        calc1.increment_year()
+    calc2.advance_to_year(2018)
+    assert calc2.current_year == 2018
+    assert calc2.records.current_year == 2018
+    assert_array_equal(calc1.records.FLPDYR, calc2.records.FLPDYR)
+    calc1.calc_all()
+    calc2.calc_all()
+    for name in ['e00200', 'e00900', 'e01000', 's006', '_iitax']:
+        assert np.allclose(getattr(calc1.records, name),
+                           getattr(calc2.records, name))
+    with pytest.raises(ValueError):
+        calc2.advance_to_year(2018)
+
+
+def test_run_budget_window():
+    recs = Records(data=TAX_DTA, weights=WEIGHTS, start_year=2009)
+    calc = Calculator(policy=Policy(), records=recs)
+    iitax = calc.records._iitax.copy()
+    serial = calc.run_budget_window(years=[2013, 2015], record_results=True,
+                                    processes=1)
+    pooled = calc.run_budget_window(years=[2013, 2015], record_results=True,
+                                    processes=2)
+    assert calc.current_year == 2013
+    assert_array_equal(calc.records._iitax, iitax)
+    assert list(serial['aggregate'].index) == [2013, 2015]
+    assert np.allclose(serial['aggregate'].values, pooled['aggregate'].values)
+    for name in ['_iitax', '_fica', '_combined']:
+        assert_array_equal(serial['records'][name], pooled['records'][name])
+    calc.calc_all()
+    assert np.allclose(serial['records']['_iitax'][0], calc.records._iitax)
+    assert np.allclose(serial['aggregate']['_iitax'][2013],
+                       (calc.records._iitax * calc.records.s006).sum())
+    assert 'records' not in calc.run_budget_window(years=[2014],
+                                                   processes=1)
+    with pytest.raises(ValueError):
+        calc.run_budget_window(years=[2012])
+
+
+def test_run_budget_window_after_threads_exits():
+    import subprocess
+    # the pool must not fork a process in which threads have run
+    code = '\n'.join([
+        'import pandas as pd',
+        'from taxcalc import Policy, Records, Calculator',
+        'recs = Records(data=pd.read_csv({!r}, compression="gzip"),',
+        '               weights=pd.read_csv({!r}), start_year=2009)',
+        'calc = Calculator(policy=Policy(), records=recs, threads=2)',
+        'calc.calc_all()',
+        'calc.run_budget_window(years=[2013, 2014], processes=2)',
+    ]).format(TAX_DTA_PATH, WEIGHTS_PATH)
+    subprocess.check_call([sys.executable, '-c', code],
+                          cwd=os.path.join(CUR_PATH, '..', '..'),
+                          timeout=600)
+
+
+def test_calc_all_chunks_matches_calc_all():
+    recs = Records(data=TAX_DTA, weights=WEIGHTS, start_year=2009)
+    calc = Calculator(policy=Policy(), records=recs)
+    calc.calc_all()
+    output_file = tempfile.NamedTemporaryFile(suffix='.csv', delete=False)
+    output_file.close()
+    try:
+        totals = calc_all_chunks(TAX_DTA, chunksize=4000,
+                                 output_file=output_file.name,
+                                 weights=WEIGHTS, start_year=2009)
+        results = pd.read_csv(output_file.name)
+    finally:
+        os.remove(output_file.name)
+    assert len(results) == calc.records.dim
+    for name in ['_iitax', '_fica', '_combined']:
+        assert np.allclose(results[name], getattr(calc.records, name))
+        assert np.allclose(totals[name], (getattr(calc.records, name) *
+                                          calc.records.s006).sum())
+
+
+def test_calc_all_chunks_raises_on_earlier_year():
+    with pytest.raises(ValueError):
+        calc_all_chunks(TAX_DTA, chunksize=4000, year=2012,
+                        weights=WEIGHTS, start_year=2009)
+
+
+def test_make_Calculator_raises_on_bad_threads():
+    recs = Records(data=TAX_DTA, weights=WEIGHTS, start_year=2009)
+    with pytest.raises(ValueError):
+        Calculator(policy=Policy(), records=recs, threads=0)
+    with pytest.raises(ValueError):
+        Calculator(policy=Policy(), records=recs, workers=0)
+
+
 def test_make_Calculator_files_to_ctor(policyfile):
     with open(policyfile.name) as pfile:
         policy = json.load(pfile)
@@ -310,6 +570,34 @@ def test_calculate_mtr():
     assert np.array_equal(mtr_FICA, mtr_IIT) == False
 
 
+def test_calculate_mtrs_match_separate_calculations():
+    policy = Policy()
+    puf = Records(TAX_DTA, weights=WEIGHTS, start_year=2009)
+    calc = Calculator(policy=policy, records=puf)
+    mtrs = calc.mtrs(wrt_full_compensation=False)
+    assert mtrs.shape == (puf.dim, 18)
+    assert (list(mtrs.columns.get_level_values(0)[::3]) ==
+            list(Calculator.MTR_INCOME_TYPES))
+    for income_type, names in [('e00300', ['e00300']),
+                               ('e00200p', ['e00200p', 'e00200'])]:
+        calc_up = copy.deepcopy(calc)
+        for name in names:
+            setattr(calc_up.records, name,
+                    getattr(calc_up.records, name) + 0.01)
+        calc_up.calc_all()
+        exp = (calc_up.records._iitax - calc.records._iitax) / 0.01
+        assert_array_equal(mtrs[income_type]['iit'].values, exp)
+    (_, mtr_IIT, _) = calc.mtr('e00300', wrt_full_compensation=False)
+    assert_array_equal(mtr_IIT, mtrs['e00300']['iit'].values)
+
+
+def test_calculate_mtrs_raises_on_bad_income_type():
+    puf = Records(TAX_DTA, weights=WEIGHTS, start_year=2009)
+    calc = Calculator(policy=Policy(), records=puf)
+    with pytest.raises(ValueError):
+        calc.mtrs(['e00200p', 'e99999'])
+
+
 def test_Calculator_create_difference_table():
     # create current-law Policy object and use to create Calculator calc1
     policy1 = Policy()
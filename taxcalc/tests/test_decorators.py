@@ -116,6 +116,16 @@ def test_create_apply_function_string_with_params():
     assert ans == exp
 
 
+def test_create_apply_function_string_parallel():
+    ans = create_apply_function_string(['a', 'b', 'c'], ['d', 'e'], ['d'],
+                                       parallel=True)
+    exp = ("def ap_func(x_0,x_1,x_2,x_3,x_4):\n"
+           "  for i in prange(len(x_0)):\n"
+           "    x_0[i],x_1[i],x_2[i] = jitted_f(x_3,x_4[i])\n"
+           "  return x_0,x_1,x_2\n")
+    assert ans == exp
+
+
 def test_create_toplevel_function_string_mult_outputs():
     ans = create_toplevel_function_string(['a', 'b'], ['d', 'e'],
                                           ['pm', 'pm', 'pf', 'pm'])
@@ -150,6 +160,17 @@ def test_create_toplevel_function_string():
     assert ans == exp
 
 
+def test_create_toplevel_function_string_no_df():
+    ans = create_toplevel_function_string(['a', 'b'], ['d', 'e'],
+                                          ['pm', 'pm', 'pf', 'pm'],
+                                          return_df=False)
+    exp = ("def hl_func(pm, pf):\n"
+           "        (pm.a, pm.b) = \\\n"
+           "        applied_f(pm.a, pm.b, pf.d, pm.e, )\n")
+
+    assert ans == exp
+
+
 def some_calc(x, y, z):
     a = x + y
     b = x + y + z
@@ -237,6 +258,33 @@ def test_magic_iterate_jit():
     assert_frame_equal(xx, exp)
 
 
+def test_magic_iterate_jit_threads():
+    pm = Foo()
+    pf = Foo()
+    pm.a = np.ones((5,))
+    pm.b = np.ones((5,))
+    pf.x = np.ones((5,))
+    pf.y = np.ones((5,))
+    pf.z = np.ones((5,))
+    xx = Magic_calc2(pm, pf, threads=2)
+    exp = DataFrame(data=[[2.0, 3.0]] * 5, columns=["a", "b"])
+    assert_frame_equal(xx, exp)
+
+
+def test_magic_iterate_jit_no_df():
+    pm = Foo()
+    pf = Foo()
+    pm.a = np.ones((5,))
+    pm.b = np.ones((5,))
+    pf.x = np.ones((5,))
+    pf.y = np.ones((5,))
+    pf.z = np.ones((5,))
+    ans = Magic_calc2(pm, pf, return_df=False)
+    assert ans is None
+    assert np.array_equal(pm.a, np.ones((5,)) * 2)
+    assert np.array_equal(pm.b, np.ones((5,)) * 3)
+
+
 def test_bar_iterate_jit():
     pm = Foo()
     pf = Foo()
@@ -347,3 +395,131 @@ def test_function_parameters_optional():
     exp = DataFrame(data=[[2.0, 4.0]] * 5,
                     columns=["a", "b"])
     assert_frame_equal(ans, exp)
+
+
+def test_iterate_jit_reused_with_different_layouts():
+    pm = Foo()
+    pf = Foo()
+    pf.MARS = np.ones((5,))
+    pf._sep = np.ones((5,))
+    ans1 = bar(pm, pf)
+    ans2 = bar(pm, pf)
+    assert_frame_equal(ans1, ans2)
+    # same function called with arguments held by the other object
+    pm2 = Foo()
+    pm2.MARS = np.array([1., 2., 3., 6., 1.])
+    pm2._sep = np.zeros((5,))
+    ans3 = bar(pm2, Foo())
+    exp = DataFrame(data=[2.0, 1.0, 1.0, 2.0, 2.0], columns=["_sep"])
+    assert_frame_equal(ans3, exp)
+    assert np.all(pm2._sep == exp._sep.values)
+
+
+def Lazy_calc(x, y):
+    a = x + y
+    return a
+
+
+def test_iterate_jit_makes_apply_function_on_first_call(monkeypatch):
+    import taxcalc.decorators
+    made = []
+    make_apply_function = taxcalc.decorators.make_apply_function
+
+    def counting_make_apply_function(*args, **kwargs):
+        made.append(args[0].__name__)
+        return make_apply_function(*args, **kwargs)
+
+    monkeypatch.setattr(taxcalc.decorators, 'make_apply_function',
+                        counting_make_apply_function)
+
+    lazy_calc = iterate_jit(nopython=True)(Lazy_calc)
+    assert made == []
+    assert lazy_calc.out_args == ['a']
+    pm = Foo()
+    pf = Foo()
+    pf.x = np.ones((5,))
+    pf.y = np.ones((5,))
+    pf.a = np.zeros((5,))
+    lazy_calc(pm, pf, return_df=False)
+    lazy_calc(pm, pf, return_df=False)
+    assert made == ['Lazy_calc']
+    assert np.array_equal(pf.a, np.ones((5,)) * 2)
+    # the names of the policy parameters are only found once
+    assert allowed_parameter_names() is allowed_parameter_names()
+    assert {'_II_em', 'II_em', 'puf'} <= allowed_parameter_names()
+
+
+def test_apply_function_source_file(tmpdir):
+    cache_dir = str(tmpdir.join('kernels'))
+    apfunc = create_apply_function_string(['a', 'b'], ['x', 'y', 'z'], [])
+    path = apply_function_source_file(some_calc, apfunc, cache_dir)
+    assert os.path.isfile(path)
+    with open(path) as src_file:
+        assert src_file.read() == apfunc
+    mtime = os.stat(path).st_mtime
+    # the same function and source map to the same, untouched file
+    assert apply_function_source_file(some_calc, apfunc, cache_dir) == path
+    assert os.stat(path).st_mtime == mtime
+    # a different apply function source maps to a different file
+    apfunc2 = create_apply_function_string(['a', 'b'], ['x', 'y', 'z'], ['z'])
+    assert apply_function_source_file(some_calc, apfunc2, cache_dir) != path
+
+
+def test_fused_jit():
+    def make_objects():
+        pm = Foo()
+        pf = Foo()
+        pf.a = np.zeros((5,))
+        pf.b = np.zeros((5,))
+        pf.c = np.zeros((5,))
+        pf.d = np.zeros((5,))
+        pf.e = np.zeros((5,))
+        pf.f = np.zeros((5,))
+        pf.x = np.arange(5.)
+        pf.y = np.ones((5,))
+        pf.z = np.ones((5,))
+        return pm, pf
+    pm1, pf1 = make_objects()
+    Magic_calc2(pm1, pf1)
+    ret_everything(pm1, pf1)
+    pm2, pf2 = make_objects()
+    fused = fused_jit([Magic_calc2, ret_everything], nopython=True)
+    assert fused(pm2, pf2) is None
+    for name in ['a', 'b', 'c', 'd', 'e', 'f']:
+        assert np.array_equal(getattr(pf1, name), getattr(pf2, name))
+    assert np.array_equal(pf2.f, np.arange(5.) * 2 + 3)
+
+
+def test_fused_jit_threads():
+    pm = Foo()
+    pf = Foo()
+    for name in ['a', 'b', 'c', 'd', 'e', 'f']:
+        setattr(pf, name, np.zeros((5,)))
+    pf.x = np.arange(5.)
+    pf.y = np.ones((5,))
+    pf.z = np.ones((5,))
+    fused = fused_jit([Magic_calc2, ret_everything], nopython=True)
+    fused(pm, pf, threads=2)
+    assert np.array_equal(pf.f, np.arange(5.) * 2 + 3)
+
+
+@iterate_jit(nopython=True)
+def deduction_tax(x, _standard, c04470, c21060):
+    c05800 = x - _standard - c04470
+    return c05800
+
+
+def test_fused_jit_deduction_choice():
+    pm = Foo()
+    pf = Foo()
+    pf.x = np.ones((3,)) * 10.
+    pf._standard = np.ones((3,)) * 5.
+    pf.c04470 = np.array([3., 5., 8.])
+    pf.c21060 = np.array([1., 2., 3.])
+    pf.c05800 = np.zeros((3,))
+    choose = fused_jit((), [deduction_tax], nopython=True)
+    choose(pm, pf)
+    assert np.array_equal(pf.c05800, [5., 5., 2.])
+    assert np.array_equal(pf._standard, [5., 5., 0.])
+    assert np.array_equal(pf.c04470, [0., 0., 8.])
+    assert np.array_equal(pf.c21060, [0., 0., 3.])
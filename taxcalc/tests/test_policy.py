@@ -3,6 +3,7 @@ import sys
 CUR_PATH = os.path.abspath(os.path.dirname(__file__))
 sys.path.append(os.path.join(CUR_PATH, "../../"))
 import json
+import copy
 import numpy as np
 from numpy.testing import assert_array_equal
 import pandas as pd
@@ -410,6 +411,85 @@ def test_create_parameters_from_file(policyfile):
                                            num_years=ppo.num_years))
 
 
+def test_parameter_block():
+    ppo = Policy()
+    assert ppo._II_em.base is not None
+    assert 'II_em' in ppo.parameter_names
+    assert ppo.II_em == ppo._II_em[0]
+    ppo.set_year(2015)
+    assert ppo.II_em == ppo._II_em[2]
+    assert_array_equal(ppo.STD, ppo._STD[2])
+    # a value set directly lasts until the next call to set_year
+    ppo.II_em = 0
+    assert ppo.II_em == 0
+    ppo.set_year(2016)
+    assert ppo.II_em == ppo._II_em[3]
+    # changing all years' values in place changes the current values
+    # once set_year is called
+    ppo2 = copy.deepcopy(ppo)
+    ppo2._II_em[3] = 1
+    ppo2.set_year(2016)
+    assert ppo2.II_em == 1
+    assert ppo.II_em != 1
+    assert not hasattr(ppo, 'no_such_parameter')
+
+
+def test_policy_from_defaults_snapshot():
+    ppo1 = Policy()
+    ppo1.implement_reform({2015: {'_II_em': [5000]}})
+    ppo2 = Policy()
+    # the second Policy is a copy of the snapshot of the default values,
+    # which the reform of the first one leaves unchanged
+    assert ppo2._param_block is not ppo1._param_block
+    assert ppo2._II_em[2] != 5000
+    # a copy of the default values is expanded in full instead
+    ppo3 = Policy(parameter_dict=copy.deepcopy(Policy.default_data(True)))
+    assert ppo3._param_block.dtype == ppo2._param_block.dtype
+    for name in ppo2._param_block.dtype.names:
+        assert_array_equal(ppo3._param_block[name], ppo2._param_block[name])
+    # other indexing rates give other values
+    irates = dict((Policy.JSON_START_YEAR + i, 0.0)
+                  for i in range(Policy.DEFAULT_NUM_YEARS))
+    ppo4 = Policy(inflation_rates=irates)
+    assert ppo4._II_em[-1] == ppo4._II_em[2]
+    assert ppo2._II_em[-1] != ppo2._II_em[2]
+
+
+def test_import_policy_without_calc_functions():
+    import subprocess
+    code = ('import sys; from taxcalc import Policy; Policy(); '
+            'assert "numba" not in sys.modules; '
+            'assert "taxcalc.calculate" not in sys.modules')
+    subprocess.check_call([sys.executable, '-c', code],
+                          cwd=os.path.join(CUR_PATH, '..', '..'))
+
+
+def test_import_submodules_as_package_attributes():
+    import subprocess
+    code = ('import types; import taxcalc; '
+            'assert isinstance(taxcalc.records, types.ModuleType); '
+            'assert taxcalc.records.Records is taxcalc.Records; '
+            'assert isinstance(taxcalc.parameters_base, types.ModuleType); '
+            'assert isinstance(taxcalc.functions, types.ModuleType); '
+            'assert not isinstance(taxcalc.behavior, types.ModuleType); '
+            'from taxcalc import Calculator, behavior; '
+            'assert not isinstance(behavior, types.ModuleType)')
+    subprocess.check_call([sys.executable, '-c', code],
+                          cwd=os.path.join(CUR_PATH, '..', '..'))
+
+
+def test_unknown_package_attribute_imports_nothing():
+    import subprocess
+    code = ('import sys; import taxcalc; '
+            'assert not hasattr(taxcalc, "no_such_name"); '
+            'assert "taxcalc.records" not in sys.modules; '
+            'assert "imputed_cmbtp_itemizer" in dir(taxcalc); '
+            'assert "taxcalc.records" not in sys.modules; '
+            'from taxcalc import imputed_cmbtp_itemizer')
+    subprocess.check_call([sys.executable, '-c', code],
+                          cwd=os.path.join(CUR_PATH, '..', '..'))
+
+
 def test_parameters_get_default():
     paramdata = Policy.default_data()
     assert paramdata['_CDCC_ps'] == [15000]
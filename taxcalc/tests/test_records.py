@@ -1,10 +1,13 @@
 import os
 import sys
+import tempfile
 import numpy as np
+from numpy.testing import assert_array_equal
 import pandas as pd
 CUR_PATH = os.path.abspath(os.path.dirname(__file__))
 sys.path.append(os.path.join(CUR_PATH, "../../"))
 from taxcalc import Records, imputed_cmbtp_itemizer, Policy, Calculator
+from taxcalc import cached_csv_columns
 
 # use 1991 PUF-like data to emulate current PUF, which is private
 TAX_DTA_PATH = os.path.join(CUR_PATH, '../../tax_all1991_puf.gz')
@@ -24,6 +27,26 @@ def test_create_records_with_correct_start_year():
     assert np.any(recs._numextra != 0)
 
 
+def test_chunks_of_csv_file_have_same_dtypes():
+    # the wages of the first chunk are whole dollars, those of the second
+    # are not, so pandas would infer different dtypes for the two chunks
+    data = TAX_DTA.head(1000).copy()
+    data['e00200'] = data['e00200'].astype(object)
+    data.loc[data.index[-1], 'e00200'] += 0.5
+    data_file = tempfile.NamedTemporaryFile(suffix='.csv', delete=False)
+    data_file.close()
+    try:
+        data.to_csv(data_file.name, index=False)
+        chunks = list(Records.chunks(data_file.name, 500, weights=WEIGHTS,
+                                     start_year=Records.PUF_YEAR))
+    finally:
+        os.remove(data_file.name)
+    assert len(chunks) == 2
+    for name, arr in chunks[0].__dict__.items():
+        if isinstance(arr, np.ndarray):
+            assert getattr(chunks[1], name).dtype == arr.dtype
+
+
 def test_create_records_with_wrong_start_year():
     recs = Records(data=TAX_DTA, weights=WEIGHTS,
                    start_year=2001)
@@ -57,6 +80,164 @@ def test_blow_up():
     assert calc.records.e22250.sum() == calc.records.p22250.sum()
 
 
+def test_fork():
+    recs = Records(data=TAX_DTA, weights=WEIGHTS, start_year=2009)
+    e00200 = recs.e00200.copy()
+    forked = recs.fork()
+    assert forked.e00200 is recs.e00200
+    assert forked.e22250 is forked.p22250
+    forked.own(['e00200', 'e22250'])
+    assert forked.e00200 is not recs.e00200
+    assert forked.e22250 is not recs.e22250
+    assert forked.e22250 is forked.p22250
+    assert forked.e00300 is recs.e00300
+    forked.increment_year()
+    assert forked.e00300 is not recs.e00300
+    assert np.array_equal(recs.e00200, e00200)
+    assert recs.current_year == 2009
+
+
+def test_cached_csv_columns(tmpdir):
+    csv_path = str(tmpdir.join('factors.csv'))
+    cache_dir = str(tmpdir.join('cache'))
+    pd.DataFrame({'YEAR': [2009, 2010], 'A': [1.5, 2.5]}).to_csv(
+        csv_path, index=False)
+    for _ in range(2):
+        columns, index = cached_csv_columns(csv_path, cache_dir=cache_dir,
+                                            index_col='YEAR')
+        assert list(columns) == ['A']
+        assert np.array_equal(columns['A'], [1.5, 2.5])
+        assert np.array_equal(index, [2009, 2010])
+    assert len(os.listdir(cache_dir)) == 1
+    # changing cached columns in place leaves the cache unchanged
+    columns['A'] *= 2
+    columns, index = cached_csv_columns(csv_path, cache_dir=cache_dir,
+                                        index_col='YEAR')
+    assert np.array_equal(columns['A'], [1.5, 2.5])
+    # a changed file is parsed again
+    pd.DataFrame({'YEAR': [2009], 'A': [3.5]}).to_csv(csv_path, index=False)
+    columns, index = cached_csv_columns(csv_path, cache_dir=cache_dir,
+                                        index_col='YEAR')
+    assert np.array_equal(columns['A'], [3.5])
+    assert len(os.listdir(cache_dir)) == 2
+
+
+def test_cached_csv_columns_drop_rows(tmpdir):
+    csv_path = str(tmpdir.join('data.csv'))
+    cache_dir = str(tmpdir.join('cache'))
+    pd.DataFrame({'recid': [1, 999999, 2], 'A': [1.5, 9., 2.5]}).to_csv(
+        csv_path, index=False)
+    for _ in range(2):
+        columns, index = cached_csv_columns(csv_path, cache_dir=cache_dir,
+                                            drop_rows=('recid', 999999))
+        assert np.array_equal(columns['recid'], [1, 2])
+        assert np.array_equal(columns['A'], [1.5, 2.5])
+        assert index is None
+    columns, _ = cached_csv_columns(csv_path, cache_dir=cache_dir)
+    assert np.array_equal(columns['recid'], [1, 999999, 2])
+    assert len(os.listdir(cache_dir)) == 2
+
+
+def test_cached_csv_columns_not_cached_by_default(tmpdir, monkeypatch):
+    monkeypatch.setattr('taxcalc.records.KERNEL_CACHE_DIR', None)
+    monkeypatch.chdir(str(tmpdir))
+    csv_path = str(tmpdir.join('data.csv'))
+    pd.DataFrame({'recid': [1, 2], 'A': [1.5, 2.5]}).to_csv(
+        csv_path, index=False)
+    columns, _ = cached_csv_columns(csv_path)
+    assert np.array_equal(columns['A'], [1.5, 2.5])
+    assert os.listdir(str(tmpdir)) == ['data.csv']
+
+
+def test_create_records_from_cached_file(tmpdir, monkeypatch):
+    monkeypatch.setattr('taxcalc.records.KERNEL_CACHE_DIR', str(tmpdir))
+    recs1 = Records(data=TAX_DTA_PATH, weights=WEIGHTS, start_year=2009)
+    recs2 = Records(data=TAX_DTA_PATH, weights=WEIGHTS, start_year=2009)
+    for attrname, _ in Records.NAMES:
+        assert_array_equal(getattr(recs1, attrname), getattr(recs2, attrname))
+    assert os.listdir(str(tmpdir.join('data')))
+
+
+def test_zeroed_variables_allocated_when_used():
+    recs = Records(data=TAX_DTA, weights=WEIGHTS, start_year=2001)
+    assert 'c62100' not in recs.__dict__
+    assert np.all(recs.c62100 == 0)
+    assert recs.c62100.shape == (recs.dim,)
+    assert recs.c62100 is recs.c62100
+    assert recs.tiled(2).c21060.shape == (2 * recs.dim,)
+    # only the named arrays are copied into a tiled copy
+    recs._iitax = np.ones((recs.dim,))
+    tiled = recs.tiled(2, names=['e00200'])
+    assert_array_equal(tiled.e00200[recs.dim:], recs.e00200)
+    assert_array_equal(tiled.MARS, np.zeros((2 * recs.dim,)))
+    assert 'c62100' not in tiled.__dict__
+    assert_array_equal(tiled._iitax, np.zeros((2 * recs.dim,)))
+    assert not hasattr(recs, 'not_a_variable')
+
+
+def test_compact_dtypes():
+    import warnings
+    with warnings.catch_warnings():
+        # columns holding NaN are left as they are without a cast warning
+        warnings.simplefilter('error', RuntimeWarning)
+        recs = Records(data=TAX_DTA, weights=WEIGHTS, start_year=2009)
+    assert recs.MARS.dtype == np.int8
+    assert recs.XTOT.dtype == np.int8
+    assert recs.FLPDYR.dtype == np.int16
+    assert recs.e00200.dtype == TAX_DTA.e00200.dtype
+    assert np.array_equal(recs.MARS, TAX_DTA.mars[TAX_DTA.recid != 999999])
+    recs32 = Records(data=TAX_DTA, weights=WEIGHTS, start_year=2009,
+                     float32_amounts=True)
+    assert recs32.e00200.dtype == np.float32
+    assert recs32.s006.dtype == np.float64
+    calc = Calculator(policy=Policy(), records=recs32)
+    calc.calc_all()
+    assert calc.records._iitax.dtype == np.float64
+
+
+def test_blowup_factors():
+    recs = Records(data=TAX_DTA, weights=WEIGHTS, start_year=2009)
+    before = dict((item[0], getattr(recs, item[0]).copy())
+                  for item in Records.BLOWUP_FACTORS)
+    p04470 = recs.p04470.copy()
+    recs.increment_year()
+    bf = recs.BF.loc[2010]
+
+    def blown_up(values, factor, negative_factor):
+        # blowing up an integer array in place truncates the results
+        result = np.where(values >= 0, values * factor,
+                          values * negative_factor)
+        return result.astype(values.dtype)
+
+    assert_array_equal(recs.e00200,
+                       blown_up(before['e00200'], bf.AWAGE, bf.AWAGE))
+    assert_array_equal(recs.e00900,
+                       blown_up(before['e00900'], bf.ASCHCI, bf.ASCHCL))
+    assert_array_equal(recs.e01000, blown_up(before['e01000'], bf.ACGNS, 1.))
+    assert_array_equal(recs.p23250,
+                       blown_up(before['p23250'], bf.ACGNS, bf.ACGNS))
+    assert recs.e23250 is recs.p23250
+    assert np.array_equal(recs.p04470, p04470)
+
+
+def test_share_and_attach(assert_records_equal):
+    recs = Records(data=TAX_DTA, weights=WEIGHTS, start_year=2009)
+    path = recs.share()
+    try:
+        recs1 = Records.attach(path)
+        recs2 = Records.attach(path)
+        assert_records_equal(recs, recs1)
+        assert recs1.e22250 is recs1.p22250
+        assert recs1.current_year == recs.current_year
+        recs1.increment_year()
+        assert np.array_equal(recs2.e00200, recs.e00200)
+        calc = Calculator(policy=Policy(), records=recs2)
+        calc.calc_all()
+        assert recs2.current_year == 2013
+    finally:
+        Records.release(path)
+
+
 def test_imputation_of_cmbtp_itemizer():
     e17500 = np.array([20., 4.4, 5.])
     e00100 = np.array([40., 8.1, 90.1])
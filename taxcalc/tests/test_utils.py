@@ -103,6 +103,18 @@ def test_expand_2D_short_array():
     assert(np.allclose(exp, res))
 
 
+def test_expand_2D_matches_year_by_year_inflation():
+    x = np.array([[1., 2., 3.], [4., 5., 6.]])
+    irates = [0.02, 0.02, 0.03, 0.035, 0.04]
+    res = Policy.expand_2D(x, inflate=True, inflation_rates=irates,
+                           num_years=5)
+    cur = x[-1]
+    for year in range(2, 5):
+        cur = cur * (1. + irates[year - 1])
+        npt.assert_array_equal(res[year], cur)
+    npt.assert_array_equal(res[:2], x)
+
+
 def test_expand_2D_variable_rates():
     x = np.array([[1, 2, 3]], dtype='f8')
     cur = np.array([1, 2, 3], dtype='f8')